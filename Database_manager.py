@@ -1,67 +1,334 @@
+import logging
+import queue
 import sqlite3
 import threading
+import time
+from collections import namedtuple
 from contextlib import contextmanager
-from datetime import datetime
+from datetime import datetime, timedelta
+from pathlib import Path
+from backup import PAGES_PER_STEP, STEP_SLEEP, copy_database
+from barcode_allocator import allocate_barcodes
+from date_storage import date_storage
+from migrations import (apply_migrations, convert_to_integer_dates, current_version, rebuild_revenue_monthly,
+                        rebuild_visits_daily)
+from membership import remaining_days_sql, status_bounds, status_filter_sql, status_sql
+from query_stats import QueryStats, explain
+from text_search import build_match_query, normalize_arabic
 
 class DatabaseError(Exception):
     pass
 
+# Published to subscribers after a write commits. `keys` holds the affected
+# primary keys, or None when the whole table should be considered changed.
+ChangeEvent = namedtuple('ChangeEvent', ['table', 'operation', 'keys'])
+
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+IMPORT = 'import'
+
+logger = logging.getLogger(__name__)
+
+# Stands in for the writer connection inside transaction() while query_stats
+# is on, so statements run there are recorded like execute_query's. Anything
+# other than execute/executemany goes straight to the connection.
+class TrackedConnection:
+    def __init__(self, db_manager, conn):
+        self.db_manager = db_manager
+        self.conn = conn
+
+    def execute(self, query, parameters=()):
+        started = time.perf_counter()
+        try:
+            cursor = self.conn.execute(query, parameters)
+        except sqlite3.Error:
+            self.db_manager._track(self.conn, query, parameters, started, started, failed=True)
+            raise
+        self.db_manager._track(self.conn, query, parameters, started, started, cursor.rowcount)
+        return cursor
+
+    def executemany(self, query, rows):
+        return self.db_manager._execute_many(self.conn, query, rows, time.perf_counter())
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
 class DatabaseManager:
     _instance = None
     _lock = threading.Lock()
 
-    def __new__(cls):
+
+    def __new__(cls, db_name=None):
+        # db_name only matters for the first call, e.g. command line tools
+        # pointing at a different database file.
         with cls._lock:
             if cls._instance is None:
                 cls._instance = super(DatabaseManager, cls).__new__(cls)
-                cls._instance.init_pool()
+                cls._instance.subscribers = []
+                cls._instance.subscribers_lock = threading.Lock()
+                # Survives init_pool, e.g. across a restore
+                cls._instance.query_stats = QueryStats()
+                cls._instance.init_pool(db_name or 'gym_database.db')
             return cls._instance
 
-    def init_pool(self, db_name='gym_database.db', pool_size=5):
+    # One serialized writer connection plus a pool of read-only readers. In WAL
+    # mode readers never block the writer (and vice versa), so a long report
+    # query cannot hold up a check-in.
+    def init_pool(self, db_name='gym_database.db', pool_size=5, timeout=10.0):
         self.db_name = db_name
-        self.pool = [sqlite3.connect(db_name) for _ in range(pool_size)]
-        self.available = threading.Semaphore(pool_size)
+        self.pool_size = pool_size
+        self.pool_timeout = timeout
+        self.writer = self._connect()
+        self.writer.execute("PRAGMA journal_mode=WAL")
+        self.writer.execute("PRAGMA synchronous=NORMAL")
+        # Rows removed by INSERT OR REPLACE must fire delete triggers too, or
+        # trigger-maintained tables (search index, rollups) drift.
+        self.writer.execute("PRAGMA recursive_triggers=ON")
+        self.writer_lock = threading.Lock()
+        self.readers = queue.LifoQueue()
+        for _ in range(pool_size):
+            self.readers.put(self._connect(read_only=True))
+        # PRAGMA data_version on a connection that never writes changes on every
+        # commit made by any other connection, including other processes.
+        self.version_conn = self._connect(read_only=True)
+        self.version_lock = threading.Lock()
+        self.pool_generation = getattr(self, 'pool_generation', 0) + 1
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'reader_checkouts': 0,
+            'writer_checkouts': 0,
+            'reader_wait_seconds': 0.0,
+            'writer_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+            'timeouts': 0,
+        }
+        self.prepare_schema()
+
+    def prepare_schema(self):
+        # Returns True when an interrupted conversion to integer dates had to
+        # be finished first
         self.create_tables()
+        # Date storage codec: every query on member or visit dates goes through it
+        self.dates = date_storage(self.writer)
+        if self.dates is not None:
+            return False
+        logger.warning("Resuming the interrupted conversion to integer dates")
+        return self.convert_to_integer_dates()
+
+    def _connect(self, read_only=False):
+        if read_only:
+            uri = Path(self.db_name).resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=self.pool_timeout, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_name, timeout=self.pool_timeout, check_same_thread=False)
+        # Used by the members_fts triggers, so every connection that writes
+        # members must have it.
+        conn.create_function("normalize_ar", 1, normalize_arabic, deterministic=True)
+        return conn
+
+    def close(self):
+        with self.writer_lock:
+            for _ in range(self.pool_size):
+                try:
+                    self.readers.get(timeout=self.pool_timeout).close()
+                except queue.Empty:
+                    raise DatabaseError("Timed out waiting for the database readers to be returned")
+            with self.version_lock:
+                self.version_conn.close()
+            self.writer.close()
+
+    def data_version(self):
+        # Stamp for caching derived results: differs after any committed write
+        # and after the pool is reopened (e.g. a restored backup).
+        with self.version_lock:
+            return self.pool_generation, self.version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def external_data_version(self):
+        # Like data_version(), but read on the writer, whose PRAGMA
+        # data_version ignores its own commits: it only moves for commits made
+        # by other processes. None while the writer is busy.
+        if not self.writer_lock.acquire(blocking=False):
+            return None
+        try:
+            return self.pool_generation, self.writer.execute("PRAGMA data_version").fetchone()[0]
+        finally:
+            self.writer_lock.release()
 
     @contextmanager
-    def get_connection(self):
-        self.available.acquire()
-        connection = self.pool.pop()
+    def writer_connection(self):
+        started = time.perf_counter()
+        if not self.writer_lock.acquire(timeout=self.pool_timeout):
+            self._record_wait('writer', started, timed_out=True)
+            raise DatabaseError("Timed out waiting for the database writer")
+        self._record_wait('writer', started)
+        try:
+            yield self.writer
+        finally:
+            self.writer_lock.release()
+
+    @contextmanager
+    def reader_connection(self):
+        started = time.perf_counter()
+        try:
+            connection = self.readers.get(timeout=self.pool_timeout)
+        except queue.Empty:
+            self._record_wait('reader', started, timed_out=True)
+            raise DatabaseError("Timed out waiting for a database reader")
+        self._record_wait('reader', started)
         try:
             yield connection
         finally:
-            self.pool.append(connection)
-            self.available.release()
+            self.readers.put(connection)
+
+    # Kept for existing callers; anything that may write goes through the writer.
+    get_connection = writer_connection
+
+    def _record_wait(self, kind, started, timed_out=False):
+        waited = time.perf_counter() - started
+        with self.stats_lock:
+            if timed_out:
+                self.stats['timeouts'] += 1
+            else:
+                self.stats[f'{kind}_checkouts'] += 1
+            self.stats[f'{kind}_wait_seconds'] += waited
+            self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], waited)
+
+    def pool_stats(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['readers_total'] = self.pool_size
+        stats['readers_available'] = self.readers.qsize()
+        stats['writer_busy'] = self.writer_lock.locked()
+        return stats
 
     def execute_query(self, query, parameters=(), fetch=False):
-        with self.get_connection() as conn:
+        requested = time.perf_counter()
+        with self.writer_connection() as conn:
+            started = time.perf_counter()
             try:
                 cursor = conn.cursor()
                 cursor.execute(query, parameters)
                 conn.commit()
-                if fetch:
-                    return cursor.fetchall()
+                result = cursor.fetchall() if fetch else cursor.lastrowid
             except sqlite3.Error as e:
                 conn.rollback()
+                self._track(conn, query, parameters, requested, started, failed=True)
                 raise DatabaseError(f"Query execution failed: {e}")
+            self._track(conn, query, parameters, requested, started, len(result) if fetch else cursor.rowcount)
+            return result
+
+    def _track(self, conn, query, parameters, requested, started, rows=0, failed=False):
+        # Feeds query_stats when it is switched on; slow statements are
+        # explained on the connection that ran them, while it is still held.
+        stats = self.query_stats
+        if not stats.enabled:
+            return
+        seconds = time.perf_counter() - started
+        plan = explain(conn, query, parameters) if stats.is_slow(seconds) and not failed else None
+        stats.record(query, seconds, started - requested, max(rows, 0), failed, parameters, plan)
+
+    @contextmanager
+    def transaction(self):
+        # Several writes committed (or rolled back) together on the writer.
+        # With query_stats on, the statements run through a TrackedConnection;
+        # the wait for the writer is recorded against BEGIN IMMEDIATE.
+        requested = time.perf_counter()
+        with self.writer_connection() as conn:
+            tracked = self.query_stats.enabled
+            try:
+                # Fails once another process has held the write lock past the timeout
+                self._timed(conn, "BEGIN IMMEDIATE", requested, tracked)
+            except sqlite3.Error as e:
+                raise DatabaseError(f"Transaction failed: {e}")
+            try:
+                yield TrackedConnection(self, conn) if tracked else conn
+                self._timed(conn, "COMMIT", time.perf_counter(), tracked)
+            except sqlite3.Error as e:
+                conn.rollback()
+                raise DatabaseError(f"Transaction failed: {e}")
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def _timed(self, conn, statement, requested, tracked):
+        if not tracked:
+            conn.execute(statement)
+            return
+        started = time.perf_counter()
+        try:
+            conn.execute(statement)
+        except sqlite3.Error:
+            self._track(conn, statement, (), requested, started, failed=True)
+            raise
+        self._track(conn, statement, (), requested, started)
+
+    def execute_many(self, query, rows, conn=None):
+        if conn is not None:
+            self._execute_many(conn, query, rows, time.perf_counter())
+            return
+        with self.transaction() as conn:
+            self._execute_many(conn, query, rows, time.perf_counter())
+
+    def _execute_many(self, conn, query, rows, requested):
+        if isinstance(conn, TrackedConnection):
+            conn = conn.conn
+        started = time.perf_counter()
+        try:
+            cursor = conn.executemany(query, rows)
+        except sqlite3.Error:
+            self._track(conn, query, (), requested, started, failed=True)
+            raise
+        # The plan does not depend on the values, so a slow batch is explained with NULLs
+        self._track(conn, query, (None,) * query.count("?"), requested, started, cursor.rowcount)
+        return cursor
+
+    def subscribe(self, callback):
+        with self.subscribers_lock:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self.subscribers_lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def notify_change(self, table, operation, keys=None):
+        event = ChangeEvent(table, operation, tuple(keys) if keys is not None else None)
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Change subscriber failed")
 
     def fetch_one(self, query, parameters=()):
-        with self.get_connection() as conn:
+        requested = time.perf_counter()
+        with self.reader_connection() as conn:
+            started = time.perf_counter()
             try:
                 cursor = conn.cursor()
                 cursor.execute(query, parameters)
-                return cursor.fetchone()
+                row = cursor.fetchone()
             except sqlite3.Error as e:
+                self._track(conn, query, parameters, requested, started, failed=True)
                 raise DatabaseError(f"Fetch one failed: {e}")
+            self._track(conn, query, parameters, requested, started, 0 if row is None else 1)
+            return row
 
     def fetch_all(self, query, parameters=()):
-        with self.get_connection() as conn:
+        requested = time.perf_counter()
+        with self.reader_connection() as conn:
+            started = time.perf_counter()
             try:
                 cursor = conn.cursor()
                 cursor.execute(query, parameters)
-                return cursor.fetchall()
+                rows = cursor.fetchall()
             except sqlite3.Error as e:
+                self._track(conn, query, parameters, requested, started, failed=True)
                 raise DatabaseError(f"Fetch all failed: {e}")
+            self._track(conn, query, parameters, requested, started, len(rows))
+            return rows
 
     def create_tables(self):
         queries = [
@@ -104,10 +371,23 @@ class DatabaseManager:
         ]
         for query in queries:
             self.execute_query(query)
+        self.migrate()
+
+    def migrate(self):
+        with self.get_connection() as conn:
+            try:
+                return apply_migrations(conn)
+            except sqlite3.Error as e:
+                raise DatabaseError(f"Schema migration failed: {e}")
+
+    def get_schema_version(self):
+        with self.get_connection() as conn:
+            return current_version(conn)
 
     def add_user(self, username, password, role):
         query = "INSERT INTO users (username, password, role) VALUES (?, ?, ?)"
-        self.execute_query(query, (username, password, role))
+        user_id = self.execute_query(query, (username, password, role))
+        self.notify_change('users', INSERT, (user_id,))
 
     def get_user(self, username):
         query = "SELECT * FROM users WHERE username = ?"
@@ -116,72 +396,276 @@ class DatabaseManager:
     def add_member(self, name, barcode, plan, start_date, end_date, phone, email):
         query = """INSERT INTO members (name, barcode, plan, start_date, end_date, phone, email) 
                    VALUES (?, ?, ?, ?, ?, ?, ?)"""
-        self.execute_query(query, (name, barcode, plan, start_date, end_date, phone, email))
+        with self.transaction() as conn:
+            member_id = conn.execute(query, (name, barcode, plan, self.dates.day(start_date),
+                                             self.dates.day(end_date), phone, email)).lastrowid
+            subscription_id = self._record_subscription(conn, member_id, plan, start_date, end_date)
+        self.notify_change('members', INSERT, (member_id,))
+        self.notify_change('subscriptions', INSERT, (subscription_id,))
+        return member_id
 
     def update_member(self, member_id, name, plan, phone, email):
         query = """UPDATE members SET name = ?, plan = ?, phone = ?, email = ? 
                    WHERE id = ?"""
         self.execute_query(query, (name, plan, phone, email, member_id))
+        self.notify_change('members', UPDATE, (member_id,))
+
+    def renew_member(self, member_id, plan, start_date, end_date):
+        query = "UPDATE members SET plan = ?, start_date = ?, end_date = ? WHERE id = ?"
+        with self.transaction() as conn:
+            conn.execute(query, (plan, self.dates.day(start_date), self.dates.day(end_date), member_id))
+            subscription_id = self._record_subscription(conn, member_id, plan, start_date, end_date)
+        self.notify_change('members', UPDATE, (member_id,))
+        self.notify_change('subscriptions', INSERT, (subscription_id,))
+
+    def _record_subscription(self, conn, member_id, plan, start_date, end_date):
+        # Ledger row with the plan's price at the time of sale; the
+        # revenue_monthly triggers pick it up in the same transaction.
+        plan_row = conn.execute("SELECT id, price FROM plans WHERE name = ?", (plan,)).fetchone()
+        plan_id, price = plan_row if plan_row else (None, 0)
+        return conn.execute(
+            """INSERT INTO subscriptions (member_id, plan_id, plan_name, price, start_date, end_date, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (member_id, plan_id, plan, price, start_date, end_date, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        ).lastrowid
 
     def delete_member(self, member_id):
         query = "DELETE FROM members WHERE id = ?"
         self.execute_query(query, (member_id,))
+        self.notify_change('members', DELETE, (member_id,))
+
+    def allocate_barcodes(self, count=1):
+        with self.transaction() as conn:
+            return allocate_barcodes(conn, count)
+
+    def member_columns(self):
+        # The ten member columns in their historical order, dates as ISO text
+        dates = self.dates
+        return (f"members.id, members.name, members.barcode, members.plan, "
+                f"{dates.day_sql('members.start_date')}, {dates.day_sql('members.end_date')}, "
+                f"{dates.timestamp_sql('members.last_visit')}, members.visits, members.phone, members.email")
+
+    def get_member(self, member_id):
+        query = f"SELECT {self.member_columns()} FROM members WHERE id = ?"
+        return self.fetch_one(query, (member_id,))
+
+    # Member rows for the views: member_columns() followed by the subscription
+    # status and remaining days, both computed in SQL against one `today`
+    # (the caller's, so a whole refresh agrees on the date). `status` filters
+    # on one of the membership.STATUS_* values.
+
+    def get_members_page(self, after_id=0, limit=200, search=None, status=None, today=None):
+        # Keyset pagination: each page starts after the last id already loaded,
+        # so the cost of a page does not grow with how far the user scrolled.
+        # Searches walk the FTS index in rowid order the same way.
+        columns, column_parameters = self._member_columns(today)
+        source, key, where, parameters = self._members_source(search, status, today)
+        query = f"""SELECT {columns} FROM {source}
+                    WHERE {key} > ?{where} ORDER BY {key} LIMIT ?"""
+        return self.fetch_all(query, (*column_parameters, after_id, *parameters, limit))
+
+    def get_members_by_ids(self, member_ids, search=None, status=None, today=None):
+        if not member_ids:
+            return []
+        columns, column_parameters = self._member_columns(today)
+        source, key, where, parameters = self._members_source(search, status, today)
+        placeholders = ", ".join("?" * len(member_ids))
+        query = f"""SELECT {columns} FROM {source}
+                    WHERE {key} IN ({placeholders}){where} ORDER BY {key}"""
+        return self.fetch_all(query, (*column_parameters, *member_ids, *parameters))
+
+    def get_members_range(self, first_id, last_id, search=None, status=None, today=None):
+        columns, column_parameters = self._member_columns(today)
+        source, key, where, parameters = self._members_source(search, status, today)
+        query = f"""SELECT {columns} FROM {source}
+                    WHERE {key} BETWEEN ? AND ?{where} ORDER BY {key}"""
+        return self.fetch_all(query, (*column_parameters, first_id, last_id, *parameters))
+
+    def search_members(self, term, limit=50):
+        return self.get_members_page(0, limit, term)
+
+    def get_members_by_status(self, status, limit=None, today=None):
+        # e.g. the expiring-this-week list: a range scan of idx_members_end_date,
+        # soonest first
+        columns, column_parameters = self._member_columns(today)
+        condition, parameters = status_filter_sql("members.end_date", status, self._status_bounds(today))
+        query = f"""SELECT {columns} FROM members WHERE {condition}
+                    ORDER BY members.end_date, members.id LIMIT ?"""
+        return self.fetch_all(query, (*column_parameters, *parameters, -1 if limit is None else limit))
+
+    def count_members_by_status(self, today=None):
+        query = f"SELECT {status_sql('end_date')}, COUNT(*) FROM members GROUP BY 1"
+        return dict(self.fetch_all(query, self._status_bounds(today)))
+
+    def _status_bounds(self, today):
+        return tuple(self.dates.day(bound) for bound in status_bounds(today))
+
+    def _member_columns(self, today):
+        columns = (f"{self.member_columns()}, {status_sql('members.end_date')}, "
+                   f"{remaining_days_sql(self.dates.day_sql('members.end_date'))}")
+        return columns, (*self._status_bounds(today), status_bounds(today)[0])
+
+    def _members_source(self, search, status=None, today=None):
+        # Returns (FROM clause, key column, extra WHERE, parameters)
+        where, parameters = "", ()
+        if status:
+            condition, parameters = status_filter_sql("members.end_date", status, self._status_bounds(today))
+            where = f" AND {condition}"
+        match = build_match_query(search) if search else ""
+        if not match:
+            return "members", "members.id", where, parameters
+        return ("members_fts JOIN members ON members.id = members_fts.rowid",
+                "members_fts.rowid", f" AND members_fts MATCH ?{where}", (match, *parameters))
 
     def add_plan(self, name, duration, price):
         query = "INSERT INTO plans (name, duration, price) VALUES (?, ?, ?)"
-        self.execute_query(query, (name, duration, price))
+        plan_id = self.execute_query(query, (name, duration, price))
+        self.notify_change('plans', INSERT, (plan_id,))
 
     def update_plan(self, plan_id, name, duration, price):
         query = "UPDATE plans SET name = ?, duration = ?, price = ? WHERE id = ?"
         self.execute_query(query, (name, duration, price, plan_id))
+        self.notify_change('plans', UPDATE, (plan_id,))
 
     def delete_plan(self, plan_id):
         query = "DELETE FROM plans WHERE id = ?"
         self.execute_query(query, (plan_id,))
+        self.notify_change('plans', DELETE, (plan_id,))
 
     def record_visit(self, member_id, visit_date):
         query = "INSERT INTO visits (member_id, visit_date) VALUES (?, ?)"
-        self.execute_query(query, (member_id, visit_date))
+        visit_id = self.execute_query(query, (member_id, self.dates.timestamp(visit_date)))
+        self.notify_change('visits', INSERT, (visit_id,))
 
-    def get_active_members_count(self):
-        query = "SELECT COUNT(*) FROM members WHERE end_date >= date('now')"
-        return self.fetch_one(query)[0]
+    def record_member_visit(self, member_id, visit_date):
+        query = "UPDATE members SET last_visit = ?, visits = visits + 1 WHERE id = ?"
+        self.execute_query(query, (self.dates.timestamp(visit_date), member_id))
+        self.notify_change('members', UPDATE, (member_id,))
+
+    def get_active_members_count(self, today=None):
+        # Local date, not date('now'), which is UTC
+        query = "SELECT COUNT(*) FROM members WHERE end_date >= ?"
+        return self.fetch_one(query, (self._status_bounds(today)[0],))[0]
 
     def get_total_members_count(self):
         query = "SELECT COUNT(*) FROM members"
         return self.fetch_one(query)[0]
 
-    def get_revenue_by_plan(self):
+    def get_revenue_by_plan(self, start_month=None, end_month=None):
+        # Reads the trigger-maintained monthly rollup of the subscriptions
+        # ledger. Months are 'YYYY-MM'; plans are labelled with their current
+        # name, or the name they were sold under if since deleted.
         query = """
-            SELECT p.name, COUNT(m.id) as member_count, SUM(p.price) as total_revenue
-            FROM members m
-            JOIN plans p ON m.plan = p.name
-            GROUP BY p.name
+            SELECT COALESCE(p.name, r.plan_name) AS plan, SUM(r.subscriptions) AS subscription_count,
+                   SUM(r.revenue) AS total_revenue
+            FROM revenue_monthly r
+            LEFT JOIN plans p ON p.id = r.plan_id
+            WHERE r.month BETWEEN ? AND ?
+            GROUP BY r.plan_id
+            ORDER BY total_revenue DESC
         """
-        return self.fetch_all(query)
+        return self.fetch_all(query, (start_month or '0000-00', end_month or '9999-12'))
+
+    def get_revenue_by_month(self, start_month=None, end_month=None):
+        query = """
+            SELECT month, SUM(subscriptions), SUM(revenue)
+            FROM revenue_monthly
+            WHERE month BETWEEN ? AND ?
+            GROUP BY month
+            ORDER BY month
+        """
+        return self.fetch_all(query, (start_month or '0000-00', end_month or '9999-12'))
+
+    def rebuild_revenue_monthly(self):
+        with self.transaction() as conn:
+            rebuild_revenue_monthly(conn)
+        self.notify_change('revenue_monthly', IMPORT)
 
     def get_visits_last_30_days(self):
+        today = datetime.now().date()
+        rows = self.get_visits_between(today - timedelta(days=30), today)
+        return [(day, visit_count) for day, visit_count, _ in rows]
+
+    def get_visits_between(self, start_day, end_day):
+        # Reads the trigger-maintained rollup: one row per day instead of
+        # aggregating the raw visits table.
         query = """
-            SELECT date(visit_date) as visit_day, COUNT(*) as visit_count
-            FROM visits
-            WHERE visit_date >= date('now', '-30 days')
-            GROUP BY visit_day
-            ORDER BY visit_day
+            SELECT day, visit_count, unique_members
+            FROM visits_daily
+            WHERE day BETWEEN ? AND ?
+            ORDER BY day
         """
-        return self.fetch_all(query)
+        return self.fetch_all(query, (str(start_day), str(end_day)))
+
+    def convert_to_integer_dates(self, batch_size=10000, progress=None):
+        with self.writer_connection() as conn:
+            try:
+                converted = convert_to_integer_dates(conn, batch_size, progress)
+            except sqlite3.Error as e:
+                conn.rollback()
+                raise DatabaseError(f"Date conversion failed: {e}")
+            self.dates = date_storage(conn)
+        if converted:
+            for table in ('members', 'visits', 'visits_daily'):
+                self.notify_change(table, IMPORT)
+        return converted
+
+    def backup(self, target_file, pages=PAGES_PER_STEP, sleep=STEP_SLEEP, progress=None, token=None):
+        # A connection of its own: the copy holds a read snapshot for its whole
+        # length and must not tie up the writer or a pooled reader.
+        source = self._connect(read_only=True)
+        try:
+            return copy_database(source, target_file, pages, sleep, progress, token)
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Backup failed: {e}")
+        finally:
+            source.close()
+
+    def restore(self, backup_file):
+        # Copies a backup over the live database through the backup API on the
+        # writer connection. Other connections, including other processes such
+        # as the check-in server, see one ordinary write instead of a file
+        # replaced under them with its -wal/-shm files left behind.
+        try:
+            source = sqlite3.connect(Path(backup_file).resolve().as_uri() + "?mode=ro", uri=True)
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Restore failed: {e}")
+        try:
+            with self.writer_connection() as conn:
+                source.backup(conn)
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Restore failed: {e}")
+        finally:
+            source.close()
+        # The backup may predate migrations or use the other date storage
+        self.prepare_schema()
+        with self.version_lock:
+            self.pool_generation += 1
+        for table in ('users', 'members', 'plans', 'equipment', 'visits', 'visit_sessions', 'subscriptions',
+                      'visits_daily', 'revenue_monthly'):
+            self.notify_change(table, IMPORT)
+
+    def rebuild_visits_daily(self):
+        with self.transaction() as conn:
+            rebuild_visits_daily(conn)
+        self.notify_change('visits_daily', IMPORT)
 
     def add_equipment(self, name, status):
         query = "INSERT INTO equipment (name, status, last_maintenance) VALUES (?, ?, ?)"
-        self.execute_query(query, (name, status, datetime.now().strftime("%Y-%m-%d")))
+        equipment_id = self.execute_query(query, (name, status, datetime.now().strftime("%Y-%m-%d")))
+        self.notify_change('equipment', INSERT, (equipment_id,))
 
     def update_equipment(self, equipment_id, name, status):
         query = "UPDATE equipment SET name = ?, status = ? WHERE id = ?"
         self.execute_query(query, (name, status, equipment_id))
+        self.notify_change('equipment', UPDATE, (equipment_id,))
 
     def delete_equipment(self, equipment_id):
         query = "DELETE FROM equipment WHERE id = ?"
         self.execute_query(query, (equipment_id,))
+        self.notify_change('equipment', DELETE, (equipment_id,))
 
     def record_maintenance(self, equipment_id):
         query = "UPDATE equipment SET last_maintenance = ?, status = 'صالح للاستخدام' WHERE id = ?"
         self.execute_query(query, (datetime.now().strftime("%Y-%m-%d"), equipment_id))
+        self.notify_change('equipment', UPDATE, (equipment_id,))
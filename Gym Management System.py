@@ -1,34 +1,125 @@
+import startup_profile
 import sys
-import os
 import hashlib
-import shutil
-import random
-import csv
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QSpinBox, QDoubleSpinBox, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
                              QLineEdit, QTreeWidget, QTreeWidgetItem, QTabWidget, QComboBox,
                              QDialog, QFormLayout, QMessageBox, QInputDialog, QFileDialog,
-                             QCalendarWidget, QApplication)
-from PyQt5.QtGui import QIcon, QFont, QPixmap, QColor, QBrush
-from PyQt5.QtCore import Qt, QDateTime
+                             QCalendarWidget, QApplication, QTableView, QAbstractItemView, QProgressBar,
+                             QCheckBox, QGroupBox)
+from PyQt5.QtGui import QPixmap, QImage
+from PyQt5.QtCore import Qt, QDateTime, QObject, QThreadPool, QTimer, pyqtSignal
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from Database_manager import DatabaseManager
+startup_profile.mark("import PyQt5")
+from Database_manager import DatabaseError, DatabaseManager, DELETE
+from backup import BackupSettings, backup_due, list_backups, load_backup_settings, run_backup, save_backup_settings
+from data_transfer import export_csv, import_csv
 from login_window import LoginWindow
-import barcode
-from barcode.writer import ImageWriter
-import arabic_reshaper
-from bidi.algorithm import get_display
+from members_model import MembersTableModel
+from barcode_cache import BarcodeImageCache
+from checkin_service import CheckInService
+from membership import STATUS_ACTIVE, STATUS_EXPIRED, STATUS_EXPIRING, STATUS_UNKNOWN
+from workers import Worker
+import ui_profiler
+from report_cache import ReportCache
+from reports import REPORTS, CancelToken, cache_key, render_report
 from datetime import datetime, timedelta
+startup_profile.mark("import application modules")
+
+class DatabaseChangeNotifier(QObject):
+    # Re-emits DatabaseManager change events as a Qt signal so that writes made
+    # from worker threads are delivered to the views on the GUI thread.
+    # Writes from other processes (the check-in server) publish no events;
+    # a tick polling external_data_version() reports that one of them
+    # committed. The window's own writes do not trigger it.
+    changed = pyqtSignal(object)
+    version_changed = pyqtSignal()
+
+    def __init__(self, db_manager, parent=None, poll_ms=1000):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.db_manager.subscribe(self.relay)
+        self.version = db_manager.external_data_version()
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(poll_ms)
+        self.poll_timer.timeout.connect(self.poll)
+        self.poll_timer.start()
+
+    def relay(self, event):
+        self.changed.emit(event)
+
+    def poll(self):
+        try:
+            version = self.db_manager.external_data_version()
+        except Exception as e:
+            print(f"Error reading the database version: {e}")
+            return
+        if version is not None and version != self.version:
+            self.version = version
+            self.version_changed.emit()
 
-# Ensure the necessary directory exists for storing barcode images
-os.makedirs("barcodes", exist_ok=True)
+    def close(self):
+        self.poll_timer.stop()
+        self.db_manager.unsubscribe(self.relay)
 
 class GymManagementSystem(QMainWindow):
     def __init__(self):
         super().__init__()
         self.db_manager = DatabaseManager()
+        self.check_in_service = CheckInService(self.db_manager)
+        # Created by their tabs on first show
+        self.plans_tree = None
+        self.equipment_tree = None
         self.initialize_ui()
+        self.change_notifier = DatabaseChangeNotifier(self.db_manager, self)
+        self.change_notifier.changed.connect(self.on_database_changed)
+        self.change_notifier.version_changed.connect(self.reload_occupancy)
+        # Sessions nobody scanned out of are closed at startup and every few minutes
+        self.stale_sessions_timer = QTimer(self)
+        self.stale_sessions_timer.setInterval(5 * 60 * 1000)
+        self.stale_sessions_timer.timeout.connect(self.close_stale_sessions)
+        self.stale_sessions_timer.start()
+        QTimer.singleShot(0, self.close_stale_sessions)
+        # Scheduled backups: checked every minute, run on a worker thread
+        self.backup_token = None
+        self.backup_retry_at = datetime.min
+        self.backup_timer = QTimer(self)
+        self.backup_timer.setInterval(60 * 1000)
+        self.backup_timer.timeout.connect(self.run_scheduled_backup)
+        self.backup_timer.start()
+
+    def closeEvent(self, event):
+        if self.backup_token is not None:
+            self.backup_token.cancel()  # The partial file is removed by the worker
+        self.change_notifier.close()
+        self.check_in_service.close()
+        super().closeEvent(event)
+
+    def on_database_changed(self, event):
+        if event.table == 'members':
+            self.members_model.apply_change(event)
+        elif event.table == 'plans':
+            self.patch_tree(self.plans_tree, event, "SELECT * FROM plans WHERE id = ?", self.load_plans)
+        elif event.table == 'equipment':
+            self.patch_tree(self.equipment_tree, event, "SELECT * FROM equipment WHERE id = ?", self.load_equipment)
+        elif event.table == 'visit_sessions':
+            self.update_occupancy()
+
+    def patch_tree(self, tree, event, row_query, reload):
+        if tree is None:
+            return  # Tab not built yet; it loads everything when first shown
+        if event.keys is None:
+            reload()
+            return
+        for key in event.keys:
+            items = tree.findItems(str(key), Qt.MatchExactly, 0)
+            row = None if event.operation == DELETE else self.db_manager.fetch_one(row_query, (key,))
+            if row is None:
+                for item in items:
+                    tree.takeTopLevelItem(tree.indexOfTopLevelItem(item))
+                continue
+            item = items[0] if items else QTreeWidgetItem(tree)
+            for i, value in enumerate(row):
+                item.setText(i, str(value))
 
     def initialize_ui(self):
         self.setWindowTitle("X 1 GYM")
@@ -41,13 +132,17 @@ class GymManagementSystem(QMainWindow):
         self.tab_widget = QTabWidget()
         self.layout.addWidget(self.tab_widget)
 
-        self.create_members_tab()
-        self.create_plans_tab()
-        self.create_equipment_tab()
-        self.create_reports_tab()
-        self.create_settings_tab()
+        # Only the members tab is built up front; the rest on first show
+        self.lazy_tabs = {}
+        self.tab_widget.addTab(self.create_members_tab(), "الأعضاء")
+        self.add_lazy_tab("الخطط", self.create_plans_tab)
+        self.add_lazy_tab("الأجهزة", self.create_equipment_tab)
+        self.add_lazy_tab("التقارير", self.create_reports_tab)
+        self.add_lazy_tab("الإعدادات", self.create_settings_tab)
+        self.tab_widget.currentChanged.connect(self.build_tab)
 
         self.create_toolbar()
+        self.create_status_bar()
 
         self.theme_toggle = QPushButton("تبديل المظهر")
         self.theme_toggle.clicked.connect(self.toggle_theme)
@@ -55,6 +150,19 @@ class GymManagementSystem(QMainWindow):
 
         self.set_style("Light")
 
+    def add_lazy_tab(self, title, builder):
+        page = QWidget()
+        QVBoxLayout(page).setContentsMargins(0, 0, 0, 0)
+        self.lazy_tabs[page] = builder
+        self.tab_widget.addTab(page, title)
+
+    def build_tab(self, index):
+        page = self.tab_widget.widget(index)
+        builder = self.lazy_tabs.pop(page, None)
+        if builder:
+            page.layout().addWidget(builder())
+            startup_profile.mark(f"build tab {self.tab_widget.tabText(index)}")
+
     def create_toolbar(self):
         toolbar = self.addToolBar("الأدوات")
 
@@ -70,6 +178,67 @@ class GymManagementSystem(QMainWindow):
         import_action = toolbar.addAction("استيراد البيانات")
         import_action.triggered.connect(self.import_data)
 
+    def create_status_bar(self):
+        self.occupancy_label = QLabel()
+        self.statusBar().addWidget(self.occupancy_label)
+        self.task_label = QLabel()
+        self.task_progress = QProgressBar()
+        self.task_progress.setRange(0, 100)
+        self.task_progress.setMaximumWidth(200)
+        self.backup_label = QLabel()
+        self.statusBar().addWidget(self.backup_label)
+        self.statusBar().addPermanentWidget(self.task_label)
+        self.statusBar().addPermanentWidget(self.task_progress)
+        self.task_label.hide()
+        self.task_progress.hide()
+        self.update_occupancy()
+
+    def update_occupancy(self):
+        # Read from the service's in-memory open sessions, no COUNT(*) per refresh
+        self.occupancy_label.setText(f"المتواجدون الآن: {self.check_in_service.occupancy}")
+
+    def reload_occupancy(self):
+        # Another process (the check-in server) committed: the service drops
+        # its open sessions and re-reads them for the counter and check-out.
+        # Our own check-ins update the counter through change events instead.
+        try:
+            self.check_in_service.sync()
+        except Exception as e:
+            print(f"Error reading open sessions: {e}")
+        self.update_occupancy()
+
+    def close_stale_sessions(self):
+        try:
+            self.check_in_service.close_stale_sessions()
+        except Exception as e:
+            print(f"Error closing stale sessions: {e}")
+        self.update_occupancy()
+
+    def run_in_background(self, label, on_finished, error_message, fn, *args, **kwargs):
+        worker = Worker(fn, *args, **kwargs)
+        self.task_label.setText(label)
+        self.task_progress.setValue(0)
+        self.task_label.show()
+        self.task_progress.show()
+
+        def finished(result):
+            self.end_background_task()
+            on_finished(result)
+
+        def failed(message):
+            self.end_background_task()
+            QMessageBox.critical(self, "خطأ", f"{error_message}: {message}")
+
+        worker.signals.progress.connect(self.task_progress.setValue)
+        worker.signals.finished.connect(finished)
+        worker.signals.error.connect(failed)
+        QThreadPool.globalInstance().start(worker)
+        return worker
+
+    def end_background_task(self):
+        self.task_label.hide()
+        self.task_progress.hide()
+
     def create_members_tab(self):
         members_widget = QWidget()
         layout = QVBoxLayout(members_widget)
@@ -77,27 +246,48 @@ class GymManagementSystem(QMainWindow):
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("بحث عن عضو")
-        self.search_input.textChanged.connect(self.search_members)
+        # Typing restarts a short timer; the query runs once the user pauses
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.search_members)
+        self.search_input.textChanged.connect(self.search_timer.start)
         search_button = QPushButton("بحث")
         search_button.clicked.connect(self.search_members)
+        self.status_filter = QComboBox()
+        self.status_filter.addItem("كل الحالات", "")
+        for status in (STATUS_ACTIVE, STATUS_EXPIRING, STATUS_EXPIRED, STATUS_UNKNOWN):
+            self.status_filter.addItem(status, status)
+        self.status_filter.currentIndexChanged.connect(self.search_members)
         search_layout.addWidget(self.search_input)
+        search_layout.addWidget(self.status_filter)
         search_layout.addWidget(search_button)
         layout.addLayout(search_layout)
 
-        self.members_tree = QTreeWidget()
-        self.members_tree.setHeaderLabels([
-            "ID", "الاسم", "الباركود", "الخطة", "تاريخ البدء", "تاريخ الانتهاء", 
-            "آخر زيارة", "عدد الزيارات", "رقم الهاتف", "البريد الإلكتروني", 
-            "حالة الاشتراك", "الأيام المتبقية"
-        ])
-        self.members_tree.setColumnCount(12)
+        self.members_model = MembersTableModel(self.db_manager, parent=self)
+        self.members_view = QTableView()
+        self.members_view.setModel(self.members_model)
+        self.members_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.members_view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.members_view.verticalHeader().hide()
+        # Fixed row heights keep scrolling O(visible rows) for large tables
+        self.members_view.verticalHeader().setDefaultSectionSize(24)
 
         # Set column widths
         column_widths = [50, 150, 100, 80, 100, 100, 100, 80, 100, 150, 100, 80]
         for i, width in enumerate(column_widths):
-            self.members_tree.setColumnWidth(i, width)
+            self.members_view.setColumnWidth(i, width)
+
+        layout.addWidget(self.members_view)
 
-        layout.addWidget(self.members_tree)
+        # Barcode images are rendered only for the selected member
+        self.barcode_cache = BarcodeImageCache(parent=self)
+        self.barcode_cache.ready.connect(self.show_member_barcode)
+        self.barcode_preview = QLabel()
+        self.barcode_preview.setAlignment(Qt.AlignCenter)
+        self.barcode_preview.setFixedHeight(120)
+        layout.addWidget(self.barcode_preview)
+        self.members_view.selectionModel().selectionChanged.connect(self.on_member_selected)
 
         buttons_layout = QHBoxLayout()
         buttons = [
@@ -112,8 +302,8 @@ class GymManagementSystem(QMainWindow):
             buttons_layout.addWidget(button)
         layout.addLayout(buttons_layout)
 
-        self.tab_widget.addTab(members_widget, "الأعضاء")
         self.load_members()
+        return members_widget
 
     def create_plans_tab(self):
         plans_widget = QWidget()
@@ -135,8 +325,8 @@ class GymManagementSystem(QMainWindow):
         buttons_layout.addWidget(delete_button)
         layout.addLayout(buttons_layout)
 
-        self.tab_widget.addTab(plans_widget, "الخطط")
         self.load_plans()
+        return plans_widget
 
     def add_plan_dialog(self):
         dialog = QDialog(self)
@@ -173,7 +363,6 @@ class GymManagementSystem(QMainWindow):
             return
 
         self.db_manager.add_plan(name, duration, price)
-        self.load_plans()
         dialog.accept()
         QMessageBox.information(self, "نجاح", f"تمت إضافة الخطة {name} بنجاح")
 
@@ -222,7 +411,6 @@ class GymManagementSystem(QMainWindow):
             return
 
         self.db_manager.update_plan(plan_id, name, duration, price)
-        self.load_plans()
         dialog.accept()
         QMessageBox.information(self, "نجاح", f"تم تحديث الخطة {name} بنجاح")
 
@@ -241,10 +429,11 @@ class GymManagementSystem(QMainWindow):
 
         if reply == QMessageBox.Yes:
             self.db_manager.delete_plan(plan_id)
-            self.load_plans()
             QMessageBox.information(self, "نجاح", "تم حذف الخطة بنجاح")
 
     def load_plans(self):
+        if self.plans_tree is None:
+            return
         self.plans_tree.clear()
         plans = self.db_manager.fetch_all("SELECT * FROM plans")
         for plan in plans:
@@ -275,10 +464,12 @@ class GymManagementSystem(QMainWindow):
         buttons_layout.addWidget(maintenance_button)
         layout.addLayout(buttons_layout)
 
-        self.tab_widget.addTab(equipment_widget, "الأجهزة")
         self.load_equipment()
+        return equipment_widget
 
     def load_equipment(self):
+        if self.equipment_tree is None:
+            return
         self.equipment_tree.clear()
         equipment = self.db_manager.fetch_all("SELECT * FROM equipment")
         for item in equipment:
@@ -316,7 +507,6 @@ class GymManagementSystem(QMainWindow):
             return
 
         self.db_manager.add_equipment(name, status)
-        self.load_equipment()
         dialog.accept()
         QMessageBox.information(self, "نجاح", f"تمت إضافة الجهاز {name} بنجاح")
 
@@ -359,7 +549,6 @@ class GymManagementSystem(QMainWindow):
             return
 
         self.db_manager.update_equipment(equipment_id, name, status)
-        self.load_equipment()
         dialog.accept()
         QMessageBox.information(self, "نجاح", f"تم تحديث الجهاز {name} بنجاح")
 
@@ -378,7 +567,6 @@ class GymManagementSystem(QMainWindow):
 
         if reply == QMessageBox.Yes:
             self.db_manager.delete_equipment(equipment_id)
-            self.load_equipment()
             QMessageBox.information(self, "نجاح", "تم حذف الجهاز بنجاح")
 
     def record_maintenance(self):
@@ -391,208 +579,221 @@ class GymManagementSystem(QMainWindow):
         equipment_name = selected_items[0].text(1)
 
         self.db_manager.record_maintenance(equipment_id)
-        self.load_equipment()
         QMessageBox.information(self, "نجاح", f"تم تسجيل صيانة الجهاز {equipment_name} بنجاح")
 
     def create_reports_tab(self):
         reports_widget = QWidget()
         layout = QVBoxLayout(reports_widget)
 
-        report_types = ["تقرير الأعضاء النشطين", "تقرير الإيرادات", "تقرير الزيارات", "تقرير الأجهزة", "تقرير الاشتراكات المنتهية"]
         self.report_combo = QComboBox()
-        self.report_combo.addItems(report_types)
+        self.report_combo.addItems(list(REPORTS))
+        # Picking another report abandons the one still being rendered
+        self.report_combo.currentIndexChanged.connect(self.cancel_report)
         layout.addWidget(self.report_combo)
 
         generate_button = QPushButton("إنشاء التقرير")
         generate_button.clicked.connect(self.generate_report)
         layout.addWidget(generate_button)
 
+        self.report_spinner = QProgressBar()
+        self.report_spinner.setRange(0, 0)  # Busy indicator
+        self.report_spinner.setTextVisible(False)
+        self.report_spinner.hide()
+        layout.addWidget(self.report_spinner)
+
         self.report_view = QWidget()
         report_layout = QVBoxLayout(self.report_view)
-        layout.addWidget(self.report_view)
+        self.report_image = QLabel()
+        self.report_image.setAlignment(Qt.AlignCenter)
+        report_layout.addWidget(self.report_image)
+        layout.addWidget(self.report_view, 1)
+
+        # Pixmaps of recent reports; reused until the database changes
+        self.report_cache = ReportCache(max_entries=8)
+        self.report_token = None
 
-        self.tab_widget.addTab(reports_widget, "التقارير")
+        return reports_widget
 
     def generate_report(self):
+        self.cancel_report()
         report_type = self.report_combo.currentText()
-        if report_type == "تقرير الأعضاء النشطين":
-            self.active_members_report()
-        elif report_type == "تقرير الإيرادات":
-            self.revenue_report()
-        elif report_type == "تقرير الزيارات":
-            self.visits_report()
-        elif report_type == "تقرير الأجهزة":
-            self.equipment_report()
-        elif report_type == "تقرير الاشتراكات المنتهية":
-            self.expired_subscriptions_report()
-
-    def active_members_report(self):
-        active_count = self.db_manager.get_active_members_count()
-        total_count = self.db_manager.get_total_members_count()
-        inactive_count = total_count - active_count
-
-        fig, ax = plt.subplots()
-        ax.pie([active_count, inactive_count], 
-            labels=[get_display(arabic_reshaper.reshape('نشط')), 
-                    get_display(arabic_reshaper.reshape('غير نشط'))], 
-            autopct='%1.1f%%')
-        ax.set_title(get_display(arabic_reshaper.reshape('نسبة الأعضاء النشطين')))
-
-        self.show_plot(fig)
-
-    def revenue_report(self):
-        data = self.db_manager.get_revenue_by_plan()
-
-        plans = [row[0] for row in data]
-        revenues = [row[2] for row in data]
-
-        fig, ax = plt.subplots()
-        ax.bar(plans, revenues)
-        ax.set_xlabel(arabic_reshaper.reshape('الخطط'))
-        ax.set_ylabel(arabic_reshaper.reshape('الإيرادات'))
-        ax.set_title(arabic_reshaper.reshape('الإيرادات حسب الخطة'))
-
-        self.show_plot(fig)
-
-    def visits_report(self):
-        data = self.db_manager.get_visits_last_30_days()
-
-        dates = [row[0] for row in data]
-        visits = [row[1] for row in data]
-
-        fig, ax = plt.subplots()
-        ax.plot(dates, visits)
-        ax.set_xlabel('التاريخ')
-        ax.set_ylabel('عدد الزيارات')
-        ax.set_title('عدد الزيارات اليومية (آخر 30 يوم)')
-        fig.autofmt_xdate()
-
-        self.show_plot(fig)
-
-    def equipment_report(self):
-        equipment = self.db_manager.fetch_all("SELECT status, COUNT(*) FROM equipment GROUP BY status")
-
-        statuses = [row[0] for row in equipment]
-        counts = [row[1] for row in equipment]
-
-        fig, ax = plt.subplots()
-        ax.pie(counts, labels=statuses, autopct='%1.1f%%')
-        ax.set_title('حالة الأجهزة')
-
-        self.show_plot(fig)
-
-    def expired_subscriptions_report(self):
-        expired = self.db_manager.fetch_all(
-            "SELECT COUNT(*) FROM members WHERE end_date < date('now')"
-        )[0][0]
-        active = self.db_manager.get_active_members_count()
-
-        fig, ax = plt.subplots()
-        ax.pie([active, expired], labels=['نشط', 'منتهي'], autopct='%1.1f%%')
-        ax.set_title('نسبة الاشتراكات المنتهية')
-
-        self.show_plot(fig)
+        size = self.report_view.contentsRect().size()
+        width, height = max(size.width(), 320), max(size.height(), 240)
+        key = cache_key(report_type, width, height)
+        version = self.db_manager.data_version()
+        pixmap = self.report_cache.get(key, version)
+        if pixmap is not None:
+            self.report_image.setPixmap(pixmap)
+            return
 
-    def show_plot(self, fig):
-        try:
-            for i in reversed(range(self.report_view.layout().count())):
-                self.report_view.layout().itemAt(i).widget().setParent(None)
-
-            # Fix Arabic text in the plot
-            for ax in fig.get_axes():
-                for text in ax.get_xticklabels() + ax.get_yticklabels():
-                    text.set_text(get_display(arabic_reshaper.reshape(text.get_text())))
-                ax.set_title(get_display(arabic_reshaper.reshape(ax.get_title())))
-                if ax.get_legend():
-                    for text in ax.get_legend().get_texts():
-                        text.set_text(get_display(arabic_reshaper.reshape(text.get_text())))
-
-            canvas = FigureCanvas(fig)
-            self.report_view.layout().addWidget(canvas)
-        except Exception as e:
-            QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء عرض التقرير: {str(e)}")
-            print(f"Error in show_plot: {str(e)}")  # For debugging
+        token = self.report_token = CancelToken()
+        worker = Worker(render_report, self.db_manager, report_type, width, height,
+                        dpi=self.logicalDpiX(), token=token)
+        worker.signals.finished.connect(lambda result: self.show_report(token, key, version, result))
+        worker.signals.error.connect(lambda message: self.report_failed(token, message))
+        self.report_spinner.show()
+        QThreadPool.globalInstance().start(worker)
+
+    def cancel_report(self):
+        if self.report_token is not None:
+            self.report_token.cancel()
+            self.report_token = None
+        self.report_spinner.hide()
+
+    def show_report(self, token, key, version, result):
+        if token is not self.report_token or result is None:
+            return  # Cancelled or superseded
+        self.report_token = None
+        self.report_spinner.hide()
+        image = QImage(result.rgba, result.width, result.height, QImage.Format_RGBA8888)
+        pixmap = QPixmap.fromImage(image)  # Copies the buffer
+        self.report_cache.put(key, version, pixmap)
+        self.report_image.setPixmap(pixmap)
+
+    def report_failed(self, token, message):
+        if token is not self.report_token:
+            return
+        self.report_token = None
+        self.report_spinner.hide()
+        QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء عرض التقرير: {message}")
 
     def export_data(self):
-        file_name, _ = QFileDialog.getSaveFileName(self, "تصدير البيانات", "", "CSV Files (*.csv)")
+        file_name, selected_filter = QFileDialog.getSaveFileName(
+            self, "تصدير البيانات", "", "CSV Files (*.csv);;Compressed CSV per table (*.csv.gz)")
         if file_name:
-            try:
-                with open(file_name, 'w', newline='', encoding='utf-8') as file:
-                    writer = csv.writer(file)
-                    # Export members
-                    writer.writerow(['Members'])
-                    writer.writerow(['ID', 'Name', 'Barcode', 'Plan', 'Start Date', 'End Date', 'Last Visit', 'Visits', 'Phone', 'Email'])
-                    members = self.db_manager.fetch_all("SELECT * FROM members")
-                    writer.writerows(members)
-
-                    # Export plans
-                    writer.writerow([])
-                    writer.writerow(['Plans'])
-                    writer.writerow(['ID', 'Name', 'Duration', 'Price'])
-                    plans = self.db_manager.fetch_all("SELECT * FROM plans")
-                    writer.writerows(plans)
-
-                    # Export equipment
-                    writer.writerow([])
-                    writer.writerow(['Equipment'])
-                    writer.writerow(['ID', 'Name', 'Status', 'Last Maintenance'])
-                    equipment = self.db_manager.fetch_all("SELECT * FROM equipment")
-                    writer.writerows(equipment)
-
-                QMessageBox.information(self, "نجاح", "تم تصدير البيانات بنجاح")
-            except Exception as e:
-                QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء تصدير البيانات: {str(e)}")
+            self.run_in_background(
+                "جاري تصدير البيانات...",
+                lambda paths: QMessageBox.information(self, "نجاح", "تم تصدير البيانات بنجاح"),
+                "حدث خطأ أثناء تصدير البيانات",
+                export_csv, self.db_manager, file_name, compress="gz" in selected_filter
+            )
 
     def import_data(self):
-        file_name, _ = QFileDialog.getOpenFileName(self, "استيراد البيانات", "", "CSV Files (*.csv)")
+        file_name, _ = QFileDialog.getOpenFileName(self, "استيراد البيانات", "", "CSV Files (*.csv *.csv.gz)")
         if file_name:
-            try:
-                with open(file_name, 'r', newline='', encoding='utf-8') as file:
-                    reader = csv.reader(file)
-                    mode = None
-                    for row in reader:
-                        if 'Members' in row:
-                            mode = 'members'
-                            next(reader)  # Skip header
-                        elif 'Plans' in row:
-                            mode = 'plans'
-                            next(reader)  # Skip header
-                        elif 'Equipment' in row:
-                            mode = 'equipment'
-                            next(reader)  # Skip header
-                        elif mode == 'members' and len(row) == 10:
-                            self.db_manager.execute_query(
-                                "INSERT OR REPLACE INTO members (id, name, barcode, plan, start_date, end_date, last_visit, visits, phone, email) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                                tuple(row)
-                            )
-                        elif mode == 'plans' and len(row) == 4:
-                            self.db_manager.execute_query(
-                                "INSERT OR REPLACE INTO plans (id, name, duration, price) VALUES (?, ?, ?, ?)",
-                                tuple(row)
-                            )
-                        elif mode == 'equipment' and len(row) == 4:
-                            self.db_manager.execute_query(
-                                "INSERT OR REPLACE INTO equipment (id, name, status, last_maintenance) VALUES (?, ?, ?, ?)",
-                                tuple(row)
-                            )
-                self.load_members()
-                self.load_plans()
-                self.load_equipment()
-                QMessageBox.information(self, "نجاح", "تم استيراد البيانات بنجاح")
-            except Exception as e:
-                QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء استيراد البيانات: {str(e)}")
+            # The views reload from the change events published once the import commits
+            self.run_in_background(
+                "جاري استيراد البيانات...",
+                lambda counts: QMessageBox.information(self, "نجاح", "تم استيراد البيانات بنجاح"),
+                "حدث خطأ أثناء استيراد البيانات",
+                import_csv, self.db_manager, file_name
+            )
 
     def backup_data(self):
-        backup_dir = QFileDialog.getExistingDirectory(self, "اختر مجلد النسخ الاحتياطي")
+        settings = load_backup_settings(self.db_manager)
+        backup_dir = QFileDialog.getExistingDirectory(self, "اختر مجلد النسخ الاحتياطي", settings.directory)
         if backup_dir:
-            try:
-                backup_file = os.path.join(backup_dir, f"gym_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
-                self.db_manager.execute_query("VACUUM INTO ?", (backup_file,))
-                QMessageBox.information(self, "نجاح", f"تم إنشاء نسخة احتياطية بنجاح في:\n{backup_file}")
-            except Exception as e:
-                QMessageBox.critical(self, "خطأ", f"فشل إنشاء النسخة الاحتياطية: {str(e)}")
+            self.start_backup(backup_dir)
+
+    def start_backup(self, backup_dir, keep=0, keep_days=0, scheduled=False):
+        # Online backup on a worker thread: check-ins carry on during the copy
+        if self.backup_token is not None:
+            if not scheduled:
+                QMessageBox.information(self, "تنبيه", "يوجد نسخ احتياطي قيد التنفيذ بالفعل")
+            return
+        token = self.backup_token = CancelToken()
+        worker = Worker(run_backup, self.db_manager, backup_dir, keep, keep_days, token=token)
+        worker.signals.progress.connect(
+            lambda percent: self.backup_label.setText(f"جاري النسخ الاحتياطي... {percent}%"))
+        worker.signals.finished.connect(lambda result: self.backup_finished(token, result, scheduled))
+        worker.signals.error.connect(lambda message: self.backup_failed(token, message, scheduled))
+        self.backup_label.setText("جاري النسخ الاحتياطي... 0%")
+        QThreadPool.globalInstance().start(worker)
+
+    def backup_finished(self, token, result, scheduled):
+        if token is self.backup_token:
+            self.backup_token = None
+        backup_file, removed = result
+        self.backup_label.setText(f"آخر نسخة احتياطية: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+        if not scheduled:
+            QMessageBox.information(self, "نجاح", f"تم إنشاء نسخة احتياطية بنجاح في:\n{backup_file}")
+
+    def backup_failed(self, token, message, scheduled):
+        if token is self.backup_token:
+            self.backup_token = None
+        if token.cancelled:
+            self.backup_label.setText("تم إلغاء النسخ الاحتياطي")
+        elif scheduled:
+            # No message box from a timer; try again in a while
+            print(f"Error in scheduled backup: {message}")
+            self.backup_label.setText("فشل النسخ الاحتياطي المجدول")
+            self.backup_retry_at = datetime.now() + timedelta(minutes=30)
+        else:
+            self.backup_label.clear()
+            QMessageBox.critical(self, "خطأ", f"فشل إنشاء النسخة الاحتياطية: {message}")
+
+    def run_scheduled_backup(self):
+        if self.backup_token is not None or datetime.now() < self.backup_retry_at:
+            return
+        try:
+            settings = load_backup_settings(self.db_manager)
+        except DatabaseError as e:
+            print(f"Error reading backup settings: {e}")
+            return
+        if backup_due(settings):
+            self.start_backup(settings.directory, settings.keep, settings.keep_days, scheduled=True)
+
+    def create_backup_schedule_group(self):
+        settings = load_backup_settings(self.db_manager)
+        group = QGroupBox("النسخ الاحتياطي التلقائي")
+        layout = QFormLayout(group)
+
+        directory_input = QLineEdit(settings.directory)
+        browse_button = QPushButton("اختيار...")
+        browse_button.clicked.connect(lambda: directory_input.setText(
+            QFileDialog.getExistingDirectory(self, "اختر مجلد النسخ الاحتياطي", directory_input.text())
+            or directory_input.text()))
+        directory_row = QHBoxLayout()
+        directory_row.addWidget(directory_input)
+        directory_row.addWidget(browse_button)
+
+        interval_input = QSpinBox()
+        interval_input.setRange(0, 24 * 30)
+        interval_input.setSuffix(" ساعة")
+        interval_input.setSpecialValueText("متوقف")
+        interval_input.setValue(settings.interval_hours)
+        keep_input = QSpinBox()
+        keep_input.setRange(0, 1000)
+        keep_input.setSpecialValueText("بدون حد")
+        keep_input.setValue(settings.keep)
+        keep_days_input = QSpinBox()
+        keep_days_input.setRange(0, 3650)
+        keep_days_input.setSuffix(" يوم")
+        keep_days_input.setSpecialValueText("بدون حد")
+        keep_days_input.setValue(settings.keep_days)
+
+        backups = list_backups(settings.directory)
+        last_backup_label = QLabel(backups[-1][0].strftime("%Y-%m-%d %H:%M") if backups else "لا يوجد")
+
+        layout.addRow("المجلد:", directory_row)
+        layout.addRow("كل:", interval_input)
+        layout.addRow("عدد النسخ المحفوظة:", keep_input)
+        layout.addRow("حذف النسخ الأقدم من:", keep_days_input)
+        layout.addRow("آخر نسخة:", last_backup_label)
+
+        save_button = QPushButton("حفظ إعدادات النسخ الاحتياطي")
+        save_button.clicked.connect(lambda: self.save_backup_schedule(BackupSettings(
+            directory_input.text().strip(), interval_input.value(), keep_input.value(), keep_days_input.value())))
+        layout.addRow(save_button)
+        return group
+
+    def save_backup_schedule(self, settings):
+        if settings.interval_hours and not settings.directory:
+            QMessageBox.warning(self, "خطأ", "يرجى اختيار مجلد النسخ الاحتياطي")
+            return
+        try:
+            save_backup_settings(self.db_manager, settings)
+        except DatabaseError as e:
+            QMessageBox.critical(self, "خطأ", f"فشل حفظ الإعدادات: {str(e)}")
+            return
+        self.backup_retry_at = datetime.min
+        QMessageBox.information(self, "نجاح", "تم حفظ إعدادات النسخ الاحتياطي")
+        self.run_scheduled_backup()
 
     def restore_data(self):
+        if self.backup_token is not None:
+            QMessageBox.information(self, "تنبيه", "يرجى الانتظار حتى ينتهي النسخ الاحتياطي الجاري")
+            return
         backup_file, _ = QFileDialog.getOpenFileName(self, "اختر ملف النسخة الاحتياطية", "", "SQLite DB Files (*.db)")
         if backup_file:
             reply = QMessageBox.warning(self, "تحذير",
@@ -600,16 +801,104 @@ class GymManagementSystem(QMainWindow):
                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
             if reply == QMessageBox.Yes:
                 try:
-                    self.db_manager.conn.close()
-                    shutil.copy(backup_file, self.db_manager.db_name)
-                    self.db_manager = DatabaseManager()  # Reinitialize the database connection
-                    self.load_members()
-                    self.load_plans()
-                    self.load_equipment()
+                    # The change events it publishes reload the views
+                    self.db_manager.restore(backup_file)
                     QMessageBox.information(self, "نجاح", "تمت استعادة البيانات بنجاح")
                 except Exception as e:
                     QMessageBox.critical(self, "خطأ", f"فشل استعادة البيانات: {str(e)}")
 
+    def query_stats_dialog(self):
+        stats = self.db_manager.query_stats
+        dialog = QDialog(self)
+        dialog.setWindowTitle("إحصائيات استعلامات قاعدة البيانات")
+        dialog.resize(1000, 600)
+        layout = QVBoxLayout(dialog)
+
+        options = QHBoxLayout()
+        enabled_check = QCheckBox("تفعيل قياس الاستعلامات")
+        enabled_check.setChecked(stats.enabled)
+        threshold_input = QSpinBox()
+        threshold_input.setRange(1, 60000)
+        threshold_input.setSuffix(" مللي ثانية")
+        threshold_input.setValue(int(stats.slow_query_ms))
+        options.addWidget(enabled_check)
+        options.addWidget(QLabel("حد الاستعلام البطيء:"))
+        options.addWidget(threshold_input)
+        options.addStretch()
+        layout.addLayout(options)
+
+        pool_label = QLabel()
+        layout.addWidget(pool_label)
+
+        tabs = QTabWidget()
+        statements_tree = QTreeWidget()
+        statements_tree.setHeaderLabels(["الاستعلام", "عدد المرات", "المتوسط (مللي ثانية)", "p95", "الأقصى",
+                                         "انتظار الاتصال", "الصفوف", "أخطاء"])
+        statements_tree.setColumnWidth(0, 420)
+        slow_tree = QTreeWidget()
+        slow_tree.setHeaderLabels(["الاستعلام", "الوقت", "المدة (مللي ثانية)", "الصفوف", "المعاملات"])
+        slow_tree.setColumnWidth(0, 520)
+        tabs.addTab(statements_tree, "الاستعلامات")
+        tabs.addTab(slow_tree, "الاستعلامات البطيئة")
+        layout.addWidget(tabs)
+
+        def refresh():
+            statements, slow = stats.snapshot()
+            statements_tree.clear()
+            for row in statements:
+                item = QTreeWidgetItem([row['statement'], str(row['calls']), f"{row['mean_ms']:.2f}",
+                                        f"{row['p95_ms']:.2f}", f"{row['max_ms']:.2f}",
+                                        f"{row['pool_wait_ms']:.2f}", str(row['rows']), str(row['errors'])])
+                item.setToolTip(0, row['statement'])
+                statements_tree.addTopLevelItem(item)
+            slow_tree.clear()
+            for entry in reversed(slow):
+                item = QTreeWidgetItem([entry['statement'], entry['time'], f"{entry['ms']:.1f}",
+                                        str(entry['rows']), str(entry['parameters'])])
+                item.setToolTip(0, entry['statement'])
+                for line in entry['plan']:
+                    item.addChild(QTreeWidgetItem([line]))
+                slow_tree.addTopLevelItem(item)
+            pool = self.db_manager.pool_stats()
+            pool_label.setText(
+                f"منذ {stats.started:%Y-%m-%d %H:%M:%S} — القراءة: {pool['reader_checkouts']} "
+                f"(انتظار {pool['reader_wait_seconds'] * 1000:.1f} مللي ثانية)، "
+                f"الكتابة: {pool['writer_checkouts']} (انتظار {pool['writer_wait_seconds'] * 1000:.1f} مللي ثانية)، "
+                f"أقصى انتظار {pool['max_wait_seconds'] * 1000:.1f} مللي ثانية، مهلات: {pool['timeouts']}")
+
+        def save():
+            file_name, _ = QFileDialog.getSaveFileName(
+                dialog, "حفظ الإحصائيات", f"query_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                "JSON Files (*.json)")
+            if file_name:
+                try:
+                    stats.dump(file_name, self.db_manager.pool_stats())
+                except OSError as e:
+                    QMessageBox.critical(dialog, "خطأ", f"فشل حفظ الإحصائيات: {str(e)}")
+
+        def reset():
+            stats.reset()
+            refresh()
+
+        enabled_check.toggled.connect(lambda checked: setattr(stats, 'enabled', checked))
+        threshold_input.valueChanged.connect(lambda value: setattr(stats, 'slow_query_ms', value))
+
+        buttons = QHBoxLayout()
+        refresh_button = QPushButton("تحديث")
+        reset_button = QPushButton("تصفير")
+        save_button = QPushButton("حفظ في ملف")
+        close_button = QPushButton("إغلاق")
+        for button in (refresh_button, reset_button, save_button, close_button):
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+        refresh_button.clicked.connect(refresh)
+        reset_button.clicked.connect(reset)
+        save_button.clicked.connect(save)
+        close_button.clicked.connect(dialog.accept)
+
+        refresh()
+        dialog.exec_()
+
     def change_password_dialog(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("تغيير كلمة المرور")
@@ -689,11 +978,11 @@ class GymManagementSystem(QMainWindow):
                     padding: 3px;
                     border-radius: 3px;
                 }
-                QTreeWidget {
+                QTreeWidget, QTableView {
                     background-color: #3a3a3a;
                     alternate-background-color: #454545;
                 }
-                QTreeWidget::item:selected {
+                QTreeWidget::item:selected, QTableView::item:selected {
                     background-color: #4a90d9;
                 }
                 QTabWidget::pane {
@@ -729,11 +1018,11 @@ class GymManagementSystem(QMainWindow):
                     padding: 3px;
                     border-radius: 3px;
                 }
-                QTreeWidget {
+                QTreeWidget, QTableView {
                     background-color: #ffffff;
                     alternate-background-color: #f5f5f5;
                 }
-                QTreeWidget::item:selected {
+                QTreeWidget::item:selected, QTableView::item:selected {
                     background-color: #308cc6;
                 }
                 QTabWidget::pane {
@@ -765,54 +1054,18 @@ class GymManagementSystem(QMainWindow):
         restore_button.clicked.connect(self.restore_data)
         layout.addWidget(restore_button)
 
+        layout.addWidget(self.create_backup_schedule_group())
+
         change_password_button = QPushButton("تغيير كلمة المرور")
         change_password_button.clicked.connect(self.change_password_dialog)
         layout.addWidget(change_password_button)
 
-        self.tab_widget.addTab(settings_widget, "الإعدادات")
+        query_stats_button = QPushButton("إحصائيات استعلامات قاعدة البيانات")
+        query_stats_button.clicked.connect(self.query_stats_dialog)
+        layout.addWidget(query_stats_button)
 
+        return settings_widget
 
-    def load_members(self):
-        self.members_tree.clear()
-        members = self.db_manager.fetch_all("SELECT * FROM members")
-        for member in members:
-            item = QTreeWidgetItem(self.members_tree)
-            item.setText(0, str(member[0]))  # ID
-            item.setText(1, member[1])       # Name
-            item.setText(2, member[2])       # Barcode
-            item.setText(3, member[3])       # Plan
-            item.setText(4, member[4])       # Start Date
-            item.setText(5, member[5])       # End Date
-            item.setText(6, str(member[7]))  # Visits
-            item.setText(7, member[8])       # Phone
-            item.setText(8, member[9])       # Email
-            status = self.check_subscription_status(member[5])
-            item.setText(9, status)
-            remaining_days = self.calculate_remaining_days(member[5])
-            item.setText(10, str(remaining_days))
-            
-            barcode_number = member[2]
-            if len(barcode_number) != 12:
-                # If the barcode is not 12 digits, generate a new one
-                barcode_number = self.generate_barcode()
-                # Update the database with the new barcode
-                self.db_manager.execute_query("UPDATE members SET barcode = ? WHERE id = ?", (barcode_number, member[0]))
-            
-            barcode_image_path = f"barcodes/{barcode_number}.png"
-            self.generate_barcode_image(barcode_number, barcode_image_path)
-            pixmap = QPixmap(barcode_image_path)
-            barcode_label = QLabel()
-            barcode_label.setPixmap(pixmap)
-            item.setData(2, Qt.UserRole, barcode_label)
-
-    
-    def calculate_remaining_days(self, end_date):
-        if not end_date:
-            return "غير محدد"
-        today = datetime.now().date()
-        end = datetime.strptime(end_date, "%Y-%m-%d").date()
-        remaining = (end - today).days
-        return max(0, remaining)
 
     def add_member_dialog(self):
         dialog = QDialog(self)
@@ -862,18 +1115,17 @@ class GymManagementSystem(QMainWindow):
 
         self.db_manager.add_member(name, barcode, plan, start_date, end_date, phone, email)
 
-        self.load_members()
         dialog.accept()
         QMessageBox.information(self, "نجاح", f"تمت إضافة العضو {name} بنجاح")
 
     def edit_member_dialog(self):
-        selected_items = self.members_tree.selectedItems()
-        if not selected_items:
+        selected = self.selected_member()
+        if not selected:
             QMessageBox.warning(self, "خطأ", "يرجى اختيار عضو لتعديله")
             return
 
-        member_id = int(selected_items[0].text(0))
-        member = self.db_manager.fetch_one("SELECT * FROM members WHERE id = ?", (member_id,))
+        member_id = selected[0]
+        member = self.db_manager.get_member(member_id)
 
         dialog = QDialog(self)
         dialog.setWindowTitle("تعديل العضو")
@@ -917,18 +1169,16 @@ class GymManagementSystem(QMainWindow):
 
         self.db_manager.update_member(member_id, name, plan, phone, email)
 
-        self.load_members()
         dialog.accept()
         QMessageBox.information(self, "نجاح", f"تم تحديث بيانات العضو {name} بنجاح")
 
     def delete_member(self):
-        selected_items = self.members_tree.selectedItems()
-        if not selected_items:
+        selected = self.selected_member()
+        if not selected:
             QMessageBox.warning(self, "خطأ", "يرجى اختيار عضو لحذفه")
             return
 
-        member_id = int(selected_items[0].text(0))
-        member_name = selected_items[0].text(1)
+        member_id, member_name = selected[0], selected[1]
 
         reply = QMessageBox.question(self, "تأكيد الحذف",
                                      f"هل أنت متأكد من حذف العضو {member_name}؟",
@@ -936,17 +1186,16 @@ class GymManagementSystem(QMainWindow):
 
         if reply == QMessageBox.Yes:
             self.db_manager.delete_member(member_id)
-            self.load_members()
             QMessageBox.information(self, "نجاح", "تم حذف العضو بنجاح")
 
     def renew_subscription(self):
-        selected_items = self.members_tree.selectedItems()
-        if not selected_items:
+        selected = self.selected_member()
+        if not selected:
             QMessageBox.warning(self, "خطأ", "يرجى اختيار عضو لتجديد اشتراكه")
             return
 
-        member_id = int(selected_items[0].text(0))
-        member = self.db_manager.fetch_one("SELECT * FROM members WHERE id = ?", (member_id,))
+        member_id = selected[0]
+        member = self.db_manager.get_member(member_id)
 
         dialog = QDialog(self)
         dialog.setWindowTitle("تجديد الاشتراك")
@@ -982,12 +1231,8 @@ class GymManagementSystem(QMainWindow):
     def process_renewal(self, member_id, plan, start_date, dialog):
         end_date = self.calculate_end_date(plan, start_date)
 
-        self.db_manager.execute_query(
-            "UPDATE members SET plan = ?, start_date = ?, end_date = ? WHERE id = ?",
-            (plan, start_date, end_date, member_id)
-        )
+        self.db_manager.renew_member(member_id, plan, start_date, end_date)
 
-        self.load_members()
         dialog.accept()
         QMessageBox.information(self, "نجاح", "تم تجديد الاشتراك بنجاح")
 
@@ -998,90 +1243,31 @@ class GymManagementSystem(QMainWindow):
         return end.strftime("%Y-%m-%d")
 
     def generate_barcode(self):
-        while True:
-            barcode = ''.join([str(random.randint(0, 9)) for _ in range(12)])
-            if not self.db_manager.fetch_one("SELECT * FROM members WHERE barcode = ?", (barcode,)):
-                return barcode   
+        return self.db_manager.allocate_barcodes()[0]
 
-    def generate_barcode_image(self, barcode_number, barcode_path):
-        try:
-            ean = barcode.get('ean13', barcode_number, writer=ImageWriter())
-            ean.save(barcode_path)
-        except barcode.errors.BarcodeError as e:
-            print(f"Error generating barcode: {e}")
-            # You might want to generate a placeholder image or handle this error in some way
-
-    def check_subscription_status(self, end_date):
-        if not end_date:
-            return "غير محدد"
-        today = datetime.now().date()
-        end = datetime.strptime(end_date, "%Y-%m-%d").date()
-        if end < today:
-            return "منتهي"
-        elif (end - today).days <= 7:
-            return "على وشك الانتهاء"
-        else:
-            return "نشط"
+    def on_member_selected(self):
+        member = self.selected_member()
+        self.barcode_preview.clear()
+        if member and member[2]:
+            self.barcode_cache.request(member[2])
 
-    def search_members(self):
-        search_term = self.search_input.text().lower()
-        
-        # If search term is empty, show all members
-        if not search_term:
-            self.load_members()
-            return
+    def show_member_barcode(self, barcode_number, pixmap):
+        member = self.selected_member()
+        if member and member[2] == barcode_number:
+            self.barcode_preview.setPixmap(pixmap.scaledToHeight(110, Qt.SmoothTransformation))
 
-        # Iterate through all items in the tree
-        root = self.members_tree.invisibleRootItem()
-        child_count = root.childCount()
-        
-        for i in range(child_count):
-            item = root.child(i)
-            match_found = False
-            
-            # Check if search term is in name, barcode, or phone
-            for column in [1, 2, 7]:  # Adjust these indices if needed
-                if search_term in item.text(column).lower():
-                    match_found = True
-                    self.highlight_item(item, search_term)
-                    break
-            
-            # Show/hide the item based on match
-            item.setHidden(not match_found)
-
-    def highlight_item(self, item, search_term):
-        highlight_color = QColor(255, 255, 0)  # Yellow highlight
-        normal_color = QColor(255, 255, 255)  # White background
-        
-        for column in range(item.columnCount()):
-            text = item.text(column).lower()
-            if search_term in text:
-                item.setBackground(column, QBrush(highlight_color))
-            else:
-                item.setBackground(column, QBrush(normal_color))
+    def search_members(self):
+        self.search_timer.stop()
+        self.members_model.reload(self.search_input.text().strip(), self.status_filter.currentData())
 
     def load_members(self):
-        self.members_tree.clear()
-        members = self.db_manager.fetch_all("SELECT * FROM members")
-        for member in members:
-            self.add_member_to_tree(member)
-        
-
-    def add_member_to_tree(self, member):
-        item = QTreeWidgetItem(self.members_tree)
-        
-        # Assuming the order: ID, Name, Barcode, Plan, Start Date, End Date, Last Visit, Visits, Phone, Email
-        for i in range(10):
-            value = str(member[i]) if i < len(member) else ""
-            item.setText(i, value)
-        
-        # Calculate and set subscription status
-        status = self.check_subscription_status(member[5])  # Assuming End Date is at index 5
-        item.setText(10, status)
-        
-        # Calculate and set remaining days
-        remaining_days = self.calculate_remaining_days(member[5])
-        item.setText(11, str(remaining_days))
+        self.members_model.reload()
+
+    def selected_member(self):
+        rows = self.members_view.selectionModel().selectedRows()
+        if not rows:
+            return None
+        return self.members_model.member_at(rows[0].row())
 
     def check_in_member(self):
         barcode, ok = QInputDialog.getText(self, "تسجيل دخول", "أدخل الباركود:")
@@ -1089,22 +1275,16 @@ class GymManagementSystem(QMainWindow):
             self.process_check_in(barcode)
 
     def process_check_in(self, barcode):
-        member = self.db_manager.fetch_one("SELECT * FROM members WHERE barcode = ?", (barcode,))
-        if not member:
+        result = self.check_in_service.check_in(barcode)
+        if not result:
             QMessageBox.warning(self, "خطأ", "لم يتم العثور على عضو بهذا الباركود")
             return
 
-        member_id, name = member[0], member[1]
-        current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        self.db_manager.record_visit(member_id, current_date)
-        self.db_manager.execute_query(
-            "UPDATE members SET last_visit = ?, visits = visits + 1 WHERE id = ?",
-            (current_date, member_id)
-        )
-
-        QMessageBox.information(self, "نجاح", f"تم تسجيل دخول {name} بنجاح")
-        self.load_members()
+        remaining = (f"{result.remaining_days} يوم متبقي" if isinstance(result.remaining_days, int)
+                     else "تاريخ الانتهاء غير محدد")
+        QMessageBox.information(self, "نجاح",
+                                f"تم تسجيل دخول {result.name} بنجاح\n"
+                                f"حالة الاشتراك: {result.status} ({remaining})")
 
     def check_out_member(self):
         barcode, ok = QInputDialog.getText(self, "تسجيل خروج", "أدخل الباركود:")
@@ -1112,21 +1292,29 @@ class GymManagementSystem(QMainWindow):
             self.process_check_out(barcode)
 
     def process_check_out(self, barcode):
-        member = self.db_manager.fetch_one("SELECT * FROM members WHERE barcode = ?", (barcode,))
-        if not member:
+        result = self.check_in_service.check_out(barcode)
+        if not result:
             QMessageBox.warning(self, "خطأ", "لم يتم العثور على عضو بهذا الباركود")
             return
+        if result.check_in is None:
+            QMessageBox.warning(self, "تنبيه", f"لا يوجد تسجيل دخول مفتوح للعضو {result.name}")
+            return
 
-        name = member[1]
-        current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        QMessageBox.information(self, "نجاح", f"تم تسجيل خروج {name} بنجاح")
+        QMessageBox.information(self, "نجاح",
+                                f"تم تسجيل خروج {result.name} بنجاح\n"
+                                f"مدة الزيارة: {result.minutes} دقيقة")
 
 def main():
     app = QApplication(sys.argv)
     app.setLayoutDirection(Qt.RightToLeft)  # Set layout direction to Right-to-Left for Arabic
+    startup_profile.mark("QApplication")
+    if ui_profiler.ENABLED:
+        ui_profiler.install(app, GymManagementSystem)
 
     db_manager = DatabaseManager()
+    # Also switched on and off from the settings tab
+    db_manager.query_stats.enabled = "--query-stats" in sys.argv
+    startup_profile.mark("open database")
 
     # Check if there's at least one user in the database
     if not db_manager.fetch_one("SELECT * FROM users"):
@@ -1138,9 +1326,17 @@ def main():
 
     # Assuming you have a LoginWindow class implemented
     login_window = LoginWindow()
+    QTimer.singleShot(0, lambda: startup_profile.mark("login dialog shown"))
     if login_window.exec_() == QDialog.Accepted:
+        startup_profile.mark("login accepted")
         window = GymManagementSystem()
+        startup_profile.mark("main window built")
         window.show()
+        # Runs once the window has been shown and the event loop is idle
+        QTimer.singleShot(0, lambda: (startup_profile.mark("main window usable"), startup_profile.report([
+            ("time to login dialog", None, "login dialog shown"),
+            ("time to usable window after login", "login accepted", "main window usable"),
+        ])))
         sys.exit(app.exec_())
 
 if __name__ == "__main__":
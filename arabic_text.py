@@ -0,0 +1,18 @@
+from functools import lru_cache
+
+# Reshaping and bidi reordering for text drawn by matplotlib, which renders
+# characters in logical order without joining them. Report titles, axis labels
+# and category names repeat on every render, so results are memoized. The
+# shaping libraries are imported on first use.
+
+
+@lru_cache(maxsize=4096)
+def shape(text):
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+    return get_display(arabic_reshaper.reshape(str(text)))
+
+
+def shape_all(texts):
+    # For label arrays (pie labels, bar categories)
+    return [shape(text) for text in texts]
@@ -0,0 +1,163 @@
+import argparse
+import os
+import re
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+# Online backups through the sqlite3 backup API. The copy runs page batch by
+# page batch on its own connection inside one read transaction: in WAL mode
+# that pins a consistent snapshot, writers keep committing meanwhile, and the
+# backup never restarts because of them (without the transaction every
+# check-in during the copy would send it back to the first page). The step
+# callback sleeps briefly between batches to leave I/O for the front desk
+# (the backup API's own `sleep` only applies when a step finds the database
+# busy). The copy goes to a .partial file that is renamed once complete.
+
+BACKUP_PREFIX = "gym_backup_"
+BACKUP_PATTERN = re.compile(rf"^{BACKUP_PREFIX}(\d{{8}}_\d{{6}})\.db$")
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+PAGES_PER_STEP = 1024
+STEP_SLEEP = 0.005
+
+# Scheduled backups, kept in schema_settings. An interval of 0 turns them off;
+# keep/keep_days of 0 mean no limit. The newest backup is never pruned.
+BackupSettings = namedtuple('BackupSettings', ['directory', 'interval_hours', 'keep', 'keep_days'])
+DEFAULT_SETTINGS = BackupSettings('', 0, 7, 30)
+_SETTING_NAMES = {field: f"backup_{field}" for field in BackupSettings._fields}
+
+
+class BackupCancelled(Exception):
+    pass
+
+
+def copy_database(source, target_file, pages=PAGES_PER_STEP, sleep=STEP_SLEEP, progress=None, token=None):
+    # source: a connection of its own (it is held in a read transaction for
+    # the whole copy). progress(done pages, total pages); a token with
+    # `cancelled` set stops the copy between batches.
+    partial = f"{target_file}.partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+
+    def step(status, remaining, total):
+        if token is not None and token.cancelled:
+            raise BackupCancelled()
+        if progress:
+            progress(total - remaining, total)
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    target = sqlite3.connect(partial)
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()  # Start the read snapshot
+        try:
+            source.backup(target, pages=pages, progress=step, sleep=sleep)
+        finally:
+            source.rollback()
+        # The copy inherits WAL mode; a standalone file is better off without
+        # -wal/-shm companions appearing whenever someone opens it.
+        target.execute("PRAGMA journal_mode=DELETE")
+        target.close()
+    except BaseException:
+        target.close()
+        os.remove(partial)
+        raise
+    os.replace(partial, target_file)
+    return target_file
+
+
+def backup_file_name(directory, when=None):
+    return os.path.join(directory, f"{BACKUP_PREFIX}{(when or datetime.now()).strftime(TIMESTAMP_FORMAT)}.db")
+
+
+def list_backups(directory):
+    # (taken at, path) for the backups in directory, oldest first
+    backups = []
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            match = BACKUP_PATTERN.match(name)
+            if match:
+                backups.append((datetime.strptime(match.group(1), TIMESTAMP_FORMAT), os.path.join(directory, name)))
+    return sorted(backups)
+
+
+def prune_backups(directory, keep, keep_days, now=None):
+    # Rotation (at most `keep` files) and retention (none older than
+    # `keep_days`); returns the removed paths
+    backups = list_backups(directory)
+    cutoff = (now or datetime.now()) - timedelta(days=keep_days) if keep_days else None
+    removed = []
+    for index, (taken, path) in enumerate(backups[:-1]):
+        if (keep and len(backups) - index > keep) or (cutoff and taken < cutoff):
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+
+def backup_due(settings, now=None):
+    if not settings.directory or settings.interval_hours <= 0:
+        return False
+    backups = list_backups(settings.directory)
+    if not backups:
+        return True
+    return (now or datetime.now()) - backups[-1][0] >= timedelta(hours=settings.interval_hours)
+
+
+def load_backup_settings(db_manager):
+    rows = dict(db_manager.fetch_all(
+        f"SELECT name, value FROM schema_settings WHERE name IN ({', '.join('?' * len(_SETTING_NAMES))})",
+        tuple(_SETTING_NAMES.values())))
+    values = {}
+    for field, default in DEFAULT_SETTINGS._asdict().items():
+        value = rows.get(_SETTING_NAMES[field], default)
+        values[field] = type(default)(value) if value != '' else default
+    return BackupSettings(**values)
+
+
+def save_backup_settings(db_manager, settings):
+    with db_manager.transaction() as conn:
+        conn.executemany("INSERT OR REPLACE INTO schema_settings (name, value) VALUES (?, ?)",
+                         [(_SETTING_NAMES[field], str(value)) for field, value in settings._asdict().items()])
+
+
+def run_backup(db_manager, directory, keep=0, keep_days=0, progress=None, token=None):
+    # One backup into directory plus pruning; returns (path, removed paths)
+    os.makedirs(directory, exist_ok=True)
+    path = db_manager.backup(backup_file_name(directory), progress=progress, token=token)
+    return path, prune_backups(directory, keep, keep_days)
+
+
+def main():
+    # For cron / Task Scheduler on machines where the app is not left running
+    from Database_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Take an online backup of the gym database")
+    parser.add_argument("--db", default="gym_database.db")
+    parser.add_argument("--dir", help="backup directory (defaults to the one set in the app)")
+    parser.add_argument("--keep", type=int, help="keep at most this many backups")
+    parser.add_argument("--keep-days", type=int, help="delete backups older than this")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(args.db)
+    settings = load_backup_settings(db_manager)
+    directory = args.dir or settings.directory
+    if not directory:
+        raise SystemExit("No backup directory given or configured")
+
+    def progress(done, total):
+        print(f"\r{done}/{total} pages", end="", flush=True)
+
+    started = time.perf_counter()
+    path, removed = run_backup(db_manager, directory,
+                               settings.keep if args.keep is None else args.keep,
+                               settings.keep_days if args.keep_days is None else args.keep_days, progress)
+    print(f"\nBackup written to {path} in {time.perf_counter() - started:.1f}s"
+          + (f"; removed {len(removed)} old backups" if removed else ""))
+    db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Member barcodes are EAN-13 codes handed out from a counter table instead of
+# random numbers probed against the members table. Codes use the GS1 "20"
+# prefix reserved for in-store numbering, followed by a 10-digit sequence and
+# the computed check digit.
+
+PREFIX = "20"
+SEQUENCE_DIGITS = 12 - len(PREFIX)
+SEQUENCE_NAME = 'member_barcode'
+
+
+def ean13_check_digit(payload):
+    total = sum(int(digit) * (3 if position % 2 else 1) for position, digit in enumerate(payload))
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_ean13(code):
+    return bool(code) and len(code) == 13 and code.isdigit() and code[-1] == ean13_check_digit(code[:12])
+
+
+def normalize_barcode(code):
+    # Cards printed from the old 12-digit codes scan with the check digit that
+    # the barcode library appended, so both forms map to the stored 13 digits.
+    code = (code or "").strip()
+    if len(code) == 12 and code.isdigit():
+        return code + ean13_check_digit(code)
+    return code
+
+
+def _code_for(value):
+    payload = PREFIX + str(value).zfill(SEQUENCE_DIGITS)
+    return payload + ean13_check_digit(payload)
+
+
+def create_sequence_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS barcode_sequence (
+        name TEXT PRIMARY KEY,
+        next_value INTEGER NOT NULL
+    )''')
+
+
+def allocate_barcodes(conn, count=1):
+    # Must run inside a write transaction; the read-and-bump of the counter is
+    # the only database work, regardless of how many members exist.
+    row = conn.execute("SELECT next_value FROM barcode_sequence WHERE name = ?", (SEQUENCE_NAME,)).fetchone()
+    start = row[0] if row else 1
+    if start + count > 10 ** SEQUENCE_DIGITS:
+        raise OverflowError("Barcode sequence exhausted")
+    conn.execute("INSERT OR REPLACE INTO barcode_sequence (name, next_value) VALUES (?, ?)",
+                 (SEQUENCE_NAME, start + count))
+    return [_code_for(value) for value in range(start, start + count)]
+
+
+def reserve_barcodes(conn, codes):
+    # Codes that arrive from outside (CSV imports) and fall in our prefix range
+    # push the counter past them, keeping later allocations collision-free.
+    in_range = [int(code[len(PREFIX):12]) for code in codes
+                if is_valid_ean13(code) and code.startswith(PREFIX)]
+    if not in_range:
+        return
+    row = conn.execute("SELECT next_value FROM barcode_sequence WHERE name = ?", (SEQUENCE_NAME,)).fetchone()
+    next_value = max(max(in_range) + 1, row[0] if row else 1)
+    conn.execute("INSERT OR REPLACE INTO barcode_sequence (name, next_value) VALUES (?, ?)",
+                 (SEQUENCE_NAME, next_value))
+
+
+def migrate_member_barcodes(conn):
+    # One-time upgrade: 12-digit codes get their check digit appended (which is
+    # what is already printed on the cards), anything else that is not a valid
+    # EAN-13 gets a fresh code, and the counter starts after the highest code
+    # already in the prefix range so it never collides with existing cards.
+    create_sequence_table(conn)
+    members = conn.execute("SELECT id, barcode FROM members").fetchall()
+    completed, invalid = [], []
+    existing = {barcode for _, barcode in members if is_valid_ean13(barcode)}
+    for member_id, barcode in members:
+        if is_valid_ean13(barcode):
+            continue
+        normalized = normalize_barcode(barcode)
+        if is_valid_ean13(normalized) and normalized not in existing:
+            completed.append((normalized, member_id))
+            existing.add(normalized)
+        else:
+            invalid.append(member_id)
+    conn.executemany("UPDATE members SET barcode = ? WHERE id = ?", completed)
+
+    reserve_barcodes(conn, existing)
+    codes = allocate_barcodes(conn, len(invalid))
+    conn.executemany("UPDATE members SET barcode = ? WHERE id = ?", zip(codes, invalid))
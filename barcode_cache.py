@@ -0,0 +1,99 @@
+import os
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QPixmap
+
+BARCODE_DIR = "barcodes"
+
+
+def barcode_image_path(barcode_number, directory=BARCODE_DIR):
+    return os.path.join(directory, f"{barcode_number}.png")
+
+
+def render_barcode_file(barcode_number, directory=BARCODE_DIR):
+    # Images are addressed by the barcode itself, so an existing file is
+    # always current and is never rendered twice.
+    path = barcode_image_path(barcode_number, directory)
+    if os.path.exists(path):
+        return path
+
+    import barcode
+    from barcode.writer import ImageWriter
+
+    os.makedirs(directory, exist_ok=True)
+    try:
+        ean = barcode.get('ean13', barcode_number, writer=ImageWriter())
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as file:
+            ean.write(file)
+        os.replace(temporary_path, path)
+    except barcode.errors.BarcodeError as e:
+        print(f"Error generating barcode: {e}")
+        return None
+    return path
+
+
+class _RenderSignals(QObject):
+    rendered = pyqtSignal(str, object)
+
+
+class _RenderTask(QRunnable):
+    def __init__(self, barcode_number, directory):
+        super().__init__()
+        self.barcode_number = barcode_number
+        self.directory = directory
+        self.signals = _RenderSignals()
+
+    def run(self):
+        path = None
+        try:
+            path = render_barcode_file(self.barcode_number, self.directory)
+        finally:
+            try:
+                self.signals.rendered.emit(self.barcode_number, path)
+            except RuntimeError:
+                pass  # The cache was destroyed while rendering (application exit)
+
+
+# Renders barcode images on demand on a small thread pool and keeps the most
+# recently used pixmaps in memory. PIL work happens off the GUI thread; the
+# QPixmap is created on the GUI thread once the PNG is on disk.
+class BarcodeImageCache(QObject):
+    ready = pyqtSignal(str, QPixmap)
+
+    def __init__(self, max_pixmaps=64, directory=BARCODE_DIR, parent=None):
+        super().__init__(parent)
+        self.max_pixmaps = max_pixmaps
+        self.directory = directory
+        self.pixmaps = OrderedDict()
+        self.pending = set()
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(2)
+
+    def request(self, barcode_number):
+        pixmap = self.pixmaps.get(barcode_number)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(barcode_number)
+            self.ready.emit(barcode_number, pixmap)
+            return pixmap
+        if barcode_number not in self.pending:
+            self.pending.add(barcode_number)
+            task = _RenderTask(barcode_number, self.directory)
+            task.signals.rendered.connect(self._on_rendered)
+            self.thread_pool.start(task)
+        return None
+
+    def image_path(self, barcode_number):
+        # Synchronous variant for printing a card
+        return render_barcode_file(barcode_number, self.directory)
+
+    def _on_rendered(self, barcode_number, path):
+        self.pending.discard(barcode_number)
+        if not path:
+            return
+        pixmap = QPixmap(path)
+        self.pixmaps[barcode_number] = pixmap
+        while len(self.pixmaps) > self.max_pixmaps:
+            self.pixmaps.popitem(last=False)
+        self.ready.emit(barcode_number, pixmap)
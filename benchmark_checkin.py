@@ -0,0 +1,76 @@
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime
+
+from checkin_service import CheckInService
+from Database_manager import DatabaseManager
+from generate_dataset import generate
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def report(label, samples):
+    samples = [sample * 1000 for sample in samples]
+    print(f"{label:<28} p50 {statistics.median(samples):7.3f} ms   "
+          f"p99 {percentile(samples, 0.99):7.3f} ms   max {max(samples):7.3f} ms")
+
+
+def legacy_check_in(db_manager, barcode):
+    # The original three round-trips, for comparison
+    member = db_manager.fetch_one("SELECT * FROM members WHERE barcode = ?", (barcode,))
+    current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    db_manager.record_visit(member[0], current_date)
+    db_manager.record_member_visit(member[0], current_date)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure front-desk check-in latency")
+    parser.add_argument("--db", default="benchmark_gym.db")
+    parser.add_argument("--members", type=int, default=100000)
+    parser.add_argument("--visits", type=int, default=10000000)
+    parser.add_argument("--checkins", type=int, default=2000)
+    args = parser.parse_args()
+
+    fresh = not os.path.exists(args.db)
+    db_manager = DatabaseManager(args.db)
+    if fresh:
+        started = time.perf_counter()
+        generate(db_manager, args.members, args.visits)
+        print(f"Seeded {args.members} members and {args.visits} visits in {time.perf_counter() - started:.1f}s")
+    else:
+        print(f"Reusing {args.db}")
+
+    barcodes = [row[0] for row in db_manager.fetch_all("SELECT barcode FROM members")]
+    service = CheckInService(db_manager)
+    started = time.perf_counter()
+    service.lookup(barcodes[0])
+    print(f"Barcode index built in {(time.perf_counter() - started) * 1000:.1f} ms for {len(barcodes)} members")
+
+    samples = []
+    for _ in range(args.checkins):
+        barcode = random.choice(barcodes)
+        started = time.perf_counter()
+        service.check_in(barcode)
+        samples.append(time.perf_counter() - started)
+    report("CheckInService.check_in", samples)
+
+    samples = []
+    for _ in range(args.checkins):
+        barcode = random.choice(barcodes)
+        started = time.perf_counter()
+        legacy_check_in(db_manager, barcode)
+        samples.append(time.perf_counter() - started)
+    report("legacy three-call path", samples)
+
+    service.close()
+    db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmark_checkin import percentile
+from checkin_service import CheckInService
+from data_transfer import export_csv, import_csv
+from Database_manager import DatabaseManager
+from generate_dataset import arabic_name, generate, phone_number
+from date_storage import TEXT_DATES
+from membership import STATUS_ACTIVE, STATUS_EXPIRED, STATUS_EXPIRING
+from migrations import convert_to_integer_dates
+from reports import REPORTS, render_report
+from text_search import normalize_arabic
+
+# Times the DatabaseManager API plus the CSV import/export, member search and
+# report paths against a scratch database (generated on first use) and writes
+# the results as JSON, so runs can be compared:
+#     python benchmark_db.py --output before.json
+#     ... change something ...
+#     python benchmark_db.py --output after.json --compare before.json
+# Write benchmarks mostly work on rows they add and delete again, but users,
+# visits and subscriptions accumulate, the import re-imports the export over
+# itself and the restore puts back a backup taken just before. Never point
+# this at a live database.
+
+# p50 ratios above this are flagged by --compare
+SLOWER = 1.25
+
+# Cases that work on rows (or files) made by an earlier case. With --only the
+# earlier case runs too, untimed.
+NEEDS = {
+    'update_member': 'add_member',
+    'renew_member': 'add_member',
+    'record_visit': 'add_member',
+    'record_member_visit': 'add_member',
+    'delete_member': 'add_member',
+    'CheckInService.check_out': 'CheckInService.check_in',
+    'update_plan': 'add_plan',
+    'delete_plan': 'add_plan',
+    'update_equipment': 'add_equipment',
+    'record_maintenance': 'add_equipment',
+    'delete_equipment': 'add_equipment',
+    'import_csv': 'export_csv',
+    'restore': 'backup',
+    'convert_to_integer_dates (backup copy)': 'backup',
+}
+
+
+def summarize(samples):
+    samples = [sample * 1000 for sample in samples]
+    return {
+        'runs': len(samples),
+        'mean_ms': statistics.fmean(samples),
+        'p50_ms': statistics.median(samples),
+        'p95_ms': percentile(samples, 0.95),
+        'max_ms': max(samples),
+    }
+
+
+def run_case(function, repeat):
+    samples = []
+    for index in range(repeat):
+        started = time.perf_counter()
+        function(index)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def build_cases(db_manager, scratch_dir, repeat, rng):
+    # (name, runs, function(index)). Cases run in order, so the write cases
+    # further down can use rows created by the ones before them; NEEDS names
+    # the case each of those depends on.
+    today = datetime.now().date()
+    max_id = db_manager.fetch_one("SELECT MAX(id) FROM members")[0] or 0
+    sample_ids = [rng.randint(1, max_id) for _ in range(repeat)] if max_id else [0] * repeat
+    search_terms = [arabic_name(rng).split()[0] for _ in range(repeat)]
+    plan = (db_manager.fetch_one("SELECT name FROM plans ORDER BY id") or ('شهري',))[0]
+    barcodes = [row[0] for row in db_manager.fetch_all(
+        "SELECT barcode FROM members WHERE barcode IS NOT NULL ORDER BY random() LIMIT ?", (repeat,))]
+    service = CheckInService(db_manager)
+    export_path = os.path.join(scratch_dir, 'export.csv')
+    backup_path = os.path.join(scratch_dir, 'backup.db')
+    tag = f"benchmark {os.getpid()}"
+    members, plans, equipment = [], [], []
+
+    def add_plan(index):
+        db_manager.add_plan(f"{tag} {index}", 30, 300)
+        plans.append(db_manager.fetch_one("SELECT id FROM plans WHERE name = ?", (f"{tag} {index}",))[0])
+
+    def visits_batch(index):
+        visit_date = db_manager.dates.timestamp(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        db_manager.execute_many("INSERT INTO visits (member_id, visit_date) VALUES (?, ?)",
+                                [(sample_ids[index], visit_date)] * 100)
+
+    def convert_copy(index):
+        # The conversion is one-way, so it runs on the backup taken before
+        conn = sqlite3.connect(backup_path)
+        conn.create_function("normalize_ar", 1, normalize_arabic, deterministic=True)
+        try:
+            convert_to_integer_dates(conn)
+        finally:
+            conn.close()
+
+    def add_equipment(index):
+        db_manager.add_equipment(f"{tag} {index}", "صالح للاستخدام")
+        equipment.append(db_manager.fetch_one("SELECT MAX(id) FROM equipment")[0])
+
+    cases = [
+        ("data_version", repeat, lambda index: db_manager.data_version()),
+        ("pool_stats", repeat, lambda index: db_manager.pool_stats()),
+        ("create_tables", repeat, lambda index: db_manager.create_tables()),
+        ("get_schema_version", repeat, lambda index: db_manager.get_schema_version()),
+        ("get_user", repeat, lambda index: db_manager.get_user("admin")),
+        ("add_user", repeat, lambda index: db_manager.add_user(f"{tag} {index}", "", "user")),
+        ("get_member", repeat, lambda index: db_manager.get_member(sample_ids[index])),
+        ("get_members_page first", repeat, lambda index: db_manager.get_members_page(0, 200)),
+        ("get_members_page deep", repeat, lambda index: db_manager.get_members_page(sample_ids[index], 200)),
+        ("get_members_by_ids 200", repeat,
+         lambda index: db_manager.get_members_by_ids(range(sample_ids[index], sample_ids[index] + 200))),
+        ("get_members_range 200", repeat,
+         lambda index: db_manager.get_members_range(sample_ids[index], sample_ids[index] + 199)),
+        ("search_members", repeat, lambda index: db_manager.search_members(search_terms[index])),
+        ("search_members prefix", repeat, lambda index: db_manager.search_members(search_terms[index][:2])),
+        ("get_members_page search+status", repeat,
+         lambda index: db_manager.get_members_page(0, 200, search_terms[index], STATUS_ACTIVE)),
+        ("get_members_by_status expiring", repeat,
+         lambda index: db_manager.get_members_by_status(STATUS_EXPIRING, today=today)),
+        ("get_members_by_status expired 200", repeat,
+         lambda index: db_manager.get_members_by_status(STATUS_EXPIRED, 200, today)),
+        ("count_members_by_status", repeat, lambda index: db_manager.count_members_by_status(today)),
+        ("get_active_members_count", repeat, lambda index: db_manager.get_active_members_count(today)),
+        ("get_total_members_count", repeat, lambda index: db_manager.get_total_members_count()),
+        ("get_revenue_by_plan", repeat, lambda index: db_manager.get_revenue_by_plan()),
+        ("get_revenue_by_month", repeat, lambda index: db_manager.get_revenue_by_month()),
+        ("get_visits_last_30_days", repeat, lambda index: db_manager.get_visits_last_30_days()),
+        ("get_visits_between year", repeat,
+         lambda index: db_manager.get_visits_between(today - timedelta(days=365), today)),
+        ("allocate_barcodes", repeat, lambda index: db_manager.allocate_barcodes(1)),
+        ("add_member", repeat, lambda index: members.append(db_manager.add_member(
+            arabic_name(rng), db_manager.allocate_barcodes(1)[0], plan, today, today + timedelta(days=30),
+            phone_number(rng), ""))),
+        ("update_member", repeat, lambda index: db_manager.update_member(
+            members[index], arabic_name(rng), plan, phone_number(rng), "")),
+        ("renew_member", repeat, lambda index: db_manager.renew_member(
+            members[index], plan, today, today + timedelta(days=30))),
+        ("record_visit", repeat, lambda index: db_manager.record_visit(
+            members[index], datetime.now().strftime("%Y-%m-%d %H:%M:%S"))),
+        ("record_member_visit", repeat, lambda index: db_manager.record_member_visit(
+            members[index], datetime.now().strftime("%Y-%m-%d %H:%M:%S"))),
+        ("execute_many 100 visits", repeat, visits_batch),
+        ("CheckInService.check_in", len(barcodes), lambda index: service.check_in(barcodes[index])),
+        ("CheckInService.check_out", len(barcodes), lambda index: service.check_out(barcodes[index])),
+        ("delete_member", repeat, lambda index: db_manager.delete_member(members[index])),
+        ("add_plan", repeat, add_plan),
+        ("update_plan", repeat, lambda index: db_manager.update_plan(plans[index], f"{tag} {index}", 60, 500)),
+        ("delete_plan", repeat, lambda index: db_manager.delete_plan(plans[index])),
+        ("add_equipment", repeat, add_equipment),
+        ("update_equipment", repeat,
+         lambda index: db_manager.update_equipment(equipment[index], f"{tag} {index}", "تحت الصيانة")),
+        ("record_maintenance", repeat, lambda index: db_manager.record_maintenance(equipment[index])),
+        ("delete_equipment", repeat, lambda index: db_manager.delete_equipment(equipment[index])),
+        ("rebuild_visits_daily", 1, lambda index: db_manager.rebuild_visits_daily()),
+        ("rebuild_revenue_monthly", 1, lambda index: db_manager.rebuild_revenue_monthly()),
+        ("export_csv", 1, lambda index: export_csv(db_manager, export_path)),
+        ("export_csv compressed", 1, lambda index: export_csv(db_manager, export_path, compress=True)),
+        ("import_csv", 1, lambda index: import_csv(db_manager, export_path)),
+        ("backup", 1, lambda index: db_manager.backup(backup_path)),
+        ("restore", 1, lambda index: db_manager.restore(backup_path)),
+        ("convert_to_integer_dates (backup copy)", 1 if db_manager.dates.mode == TEXT_DATES else 0, convert_copy),
+    ]
+    for report_type in REPORTS:
+        cases.append((f"render_report {report_type}", max(1, repeat // 4),
+                      lambda index, report_type=report_type: render_report(db_manager, report_type, 800, 600)))
+    return cases, service
+
+
+def table_counts(db_manager):
+    return {table: db_manager.fetch_one(f"SELECT COUNT(*) FROM {table}")[0]
+            for table in ('members', 'plans', 'equipment', 'visits', 'subscriptions')}
+
+
+def compare(results, baseline_file):
+    with open(baseline_file, encoding='utf-8') as file:
+        baseline = json.load(file)['results']
+    print(f"\nCompared with {baseline_file} (p50):")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]['p50_ms'], result['p50_ms']
+        ratio = new / old if old else float('inf')
+        flag = "  slower" if ratio > SLOWER else ""
+        print(f"{name:<45} {old:9.3f} -> {new:9.3f} ms  x{ratio:5.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the DatabaseManager API on a scratch database")
+    parser.add_argument("--db", default="benchmark_gym.db")
+    parser.add_argument("--members", type=int, default=10000, help="members to generate if --db does not exist")
+    parser.add_argument("--visits", type=int, default=1000000, help="visits to generate if --db does not exist")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", help="run only the benchmarks whose name contains this text")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    fresh = not os.path.exists(args.db)
+    db_manager = DatabaseManager(args.db)
+    if fresh:
+        started = time.perf_counter()
+        generate(db_manager, args.members, args.visits, seed=args.seed)
+        print(f"Generated {args.members} members and {args.visits} visits in {time.perf_counter() - started:.1f}s")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        cases, service = build_cases(db_manager, scratch_dir, args.repeat, random.Random(args.seed))
+        selected = {name for name, _, _ in cases if not args.only or args.only in name}
+        required = set()
+        for name in selected:
+            while name in NEEDS:
+                name = NEEDS[name]
+                required.add(name)
+        for name, runs, function in cases:
+            if not runs or name not in selected | required:
+                continue
+            samples = run_case(function, runs)
+            if name not in selected:
+                continue
+            result = results[name] = summarize(samples)
+            print(f"{name:<45} p50 {result['p50_ms']:9.3f} ms   p95 {result['p95_ms']:9.3f} ms   "
+                  f"max {result['max_ms']:9.3f} ms")
+        service.close()
+
+    output = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'database': os.path.abspath(args.db),
+        'date_storage': db_manager.dates.mode,
+        'rows': table_counts(db_manager),
+        'repeat': args.repeat,
+        'python': sys.version.split()[0],
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(output, file, ensure_ascii=False, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+    db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+# Runs the main window headless against generated databases of increasing size,
+# times the front-desk flows and compares them with a stored baseline:
+#     python benchmark_gui.py --update-baseline     # record this machine's baseline
+#     python benchmark_gui.py                       # exit status 1 on a regression
+# Each database size runs in its own process (DatabaseManager is a
+# singleton) on a throwaway copy, so the generated data can be reused with
+# --data-dir. Baselines only make sense on the machine that recorded them.
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_SIZES = "1000:20000,10000:200000,50000:1000000"
+SEARCH_TERM = "محمد"
+RESULT_PREFIX = "RESULT "
+
+
+def size_label(members, visits):
+    return f"{members} members / {visits} visits"
+
+
+# --- child process: one database, one window ---------------------------------
+
+def wait_until(app, condition, timeout=300):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("GUI flow did not finish in time")
+        app.processEvents()
+        time.sleep(0.001)
+    app.processEvents()
+
+
+def measure(samples, name, function):
+    started = time.perf_counter()
+    function()
+    samples.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+
+
+def run_flows(db_file, repeat):
+    from PyQt5.QtCore import QEvent, Qt, QThreadPool
+    from PyQt5.QtGui import QKeyEvent
+    from PyQt5.QtWidgets import QApplication, QDialog, QFileDialog, QMessageBox
+
+    from Database_manager import DatabaseManager
+
+    app = QApplication(sys.argv)
+    problems = []
+    QMessageBox.information = staticmethod(lambda *args, **kwargs: QMessageBox.Ok)
+    QMessageBox.warning = staticmethod(lambda parent, title, text, *args: problems.append(text) or QMessageBox.Ok)
+    QMessageBox.critical = staticmethod(lambda parent, title, text, *args: problems.append(text) or QMessageBox.Ok)
+    QMessageBox.question = staticmethod(lambda *args, **kwargs: QMessageBox.Yes)
+    export_file = str(Path(db_file).with_suffix(".csv"))
+    QFileDialog.getSaveFileName = staticmethod(lambda *args, **kwargs: (export_file, "CSV Files (*.csv)"))
+    QFileDialog.getOpenFileName = staticmethod(lambda *args, **kwargs: (export_file, "CSV Files (*.csv *.csv.gz)"))
+
+    db_manager = DatabaseManager(db_file)
+    spec = importlib.util.spec_from_file_location("gym_management_system", HERE / "Gym Management System.py")
+    gym = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(gym)
+
+    samples = {}
+    window = None
+
+    def start():
+        nonlocal window
+        window = gym.GymManagementSystem()
+        window.resize(1200, 800)
+        window.show()
+        app.processEvents()
+
+    measure(samples, "startup", start)
+    wait_until(app, lambda: QThreadPool.globalInstance().activeThreadCount() == 0)
+
+    members = db_manager.fetch_all(
+        "SELECT id, barcode, plan FROM members WHERE barcode IS NOT NULL ORDER BY random() LIMIT ?", (repeat,))
+    idle = lambda: wait_until(app, lambda: QThreadPool.globalInstance().activeThreadCount() == 0)
+
+    def type_search():
+        window.search_input.clear()
+        # Key events carrying the text: QTest.keyClicks only handles Latin keys
+        for character in SEARCH_TERM:
+            for event_type in (QEvent.KeyPress, QEvent.KeyRelease):
+                app.sendEvent(window.search_input, QKeyEvent(event_type, 0, Qt.NoModifier, character))
+        window.search_members()  # What the debounce timer runs once typing pauses
+        app.processEvents()
+
+    for member_id, barcode, plan in members:
+        measure(samples, "load_members", lambda: (window.load_members(), app.processEvents()))
+        measure(samples, "search typing", type_search)
+        window.search_input.clear()
+        window.search_members()
+        measure(samples, "status filter", lambda: (window.status_filter.setCurrentIndex(1), app.processEvents()))
+        window.status_filter.setCurrentIndex(0)
+        measure(samples, "check-in", lambda: (window.process_check_in(barcode), app.processEvents()))
+        measure(samples, "check-out", lambda: (window.process_check_out(barcode), app.processEvents()))
+        measure(samples, "renewal", lambda: (window.process_renewal(
+            member_id, plan, datetime.now().strftime("%Y-%m-%d"), QDialog()), app.processEvents()))
+
+    reports_tab = next(index for index in range(window.tab_widget.count())
+                       if window.tab_widget.tabText(index) == "التقارير")
+    measure(samples, "open reports tab", lambda: (window.tab_widget.setCurrentIndex(reports_tab), app.processEvents()))
+    # The first render also imports matplotlib on the worker thread
+    measure(samples, "first report", lambda: (window.generate_report(),
+                                              wait_until(app, lambda: window.report_token is None)))
+    for _ in range(repeat):
+        for index in range(window.report_combo.count()):
+            window.report_cache.clear()
+            window.report_combo.setCurrentIndex(index)
+            measure(samples, f"report {window.report_combo.currentText()}",
+                    lambda: (window.generate_report(), wait_until(app, lambda: window.report_token is None)))
+
+    # Heavy flows run once per size
+    measure(samples, "export", lambda: (window.export_data(),
+                                        wait_until(app, lambda: window.task_label.isHidden()), idle()))
+    measure(samples, "import", lambda: (window.import_data(),
+                                        wait_until(app, lambda: window.task_label.isHidden()), idle()))
+
+    window.close()
+    db_manager.close()
+    return {name: statistics.median(values) for name, values in samples.items()}, problems
+
+
+# --- parent process: sizes, baseline, verdict --------------------------------
+
+def prepare_database(data_dir, members, visits, seed):
+    db_file = Path(data_dir) / f"gui_{members}_{visits}_seed{seed}.db"
+    if not db_file.exists():
+        print(f"Generating {size_label(members, visits)}...", flush=True)
+        subprocess.run([sys.executable, str(HERE / "generate_dataset.py"), "--db", str(db_file),
+                        "--members", str(members), "--visits", str(visits), "--seed", str(seed)],
+                       check=True, stdout=subprocess.DEVNULL)
+    return db_file
+
+
+def run_size(db_file, repeat):
+    with tempfile.TemporaryDirectory() as work_dir:
+        work_file = Path(work_dir) / "gym_database.db"
+        shutil.copy(db_file, work_file)
+        completed = subprocess.run([sys.executable, __file__, "--child", str(work_file), "--repeat", str(repeat)],
+                                   cwd=work_dir, capture_output=True, text=True, encoding="utf-8")
+    lines = [line for line in completed.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(f"GUI run on {db_file.name} failed:\n{completed.stderr[-4000:]}")
+    return json.loads(lines[-1][len(RESULT_PREFIX):])
+
+
+def compare(results, baseline, tolerance, min_ms):
+    # A timing regresses when it exceeds the baseline by the tolerance factor
+    # and by at least min_ms, so tiny timings do not flap on noise.
+    regressions = []
+    for label, timings in results.items():
+        print(f"\n{label}")
+        for name, value in timings.items():
+            base = baseline.get(label, {}).get(name)
+            if base is None:
+                verdict = "new"
+            elif value > base * tolerance and value - base > min_ms:
+                verdict = "REGRESSION"
+                regressions.append((label, name, base, value))
+            else:
+                verdict = "ok"
+            base_text = f"{base:10.1f}" if base is not None else f"{'-':>10}"
+            print(f"  {name:<42} {value:10.1f} ms   baseline {base_text} ms   {verdict}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless GUI performance regression suite")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated members:visits")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per light flow; the median is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="keep generated databases here and reuse them")
+    parser.add_argument("--baseline", default=str(HERE / "gui_baseline.json"))
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown factor")
+    parser.add_argument("--min-ms", type=float, default=20, help="ignore slowdowns smaller than this")
+    parser.add_argument("--output", help="also write this run's timings to a JSON file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        timings, problems = run_flows(args.child, args.repeat)
+        print(RESULT_PREFIX + json.dumps({'timings': timings, 'problems': problems}, ensure_ascii=False))
+        return
+
+    sizes = [tuple(int(part) for part in size.split(":")) for size in args.sizes.split(",")]
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="gym_gui_benchmark_")
+    os.makedirs(data_dir, exist_ok=True)
+    results, problems = {}, []
+    try:
+        for members, visits in sizes:
+            label = size_label(members, visits)
+            run = run_size(prepare_database(data_dir, members, visits, args.seed), args.repeat)
+            results[label] = run['timings']
+            problems.extend(f"{label}: {problem}" for problem in run['problems'])
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    regressions = compare(results, baseline, args.tolerance, args.min_ms)
+    for problem in problems:
+        print(f"Flow reported an error: {problem}")
+
+    if args.update_baseline or not baseline:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, ensure_ascii=False, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        regressions = []
+    if regressions or problems:
+        print(f"\n{len(regressions)} timing regressions, {len(problems)} flow errors")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
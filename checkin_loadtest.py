@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+import statistics
+import time
+from pathlib import Path
+
+
+# Simulates several turnstile stations scanning against a running
+# checkin_server.py on localhost and reports throughput and latency.
+
+
+async def station(host, port, barcodes, scans, think_time, latencies, failures):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(scans):
+            started = time.perf_counter()
+            writer.write(random.choice(barcodes).encode("utf-8") + b"\n")
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - started)
+            if not response.get("ok"):
+                failures.append(response)
+            if think_time:
+                await asyncio.sleep(random.uniform(0, think_time))
+    finally:
+        writer.close()
+
+
+async def run(args, barcodes):
+    latencies, failures = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(station(args.host, args.port, barcodes, args.scans, args.think_time / 1000,
+                                   latencies, failures)
+                           for _ in range(args.stations)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency in latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{args.stations} stations x {args.scans} scans: {len(latencies)} check-ins in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:.0f}/s)")
+    print(f"latency p50 {statistics.median(latencies):.2f} ms   p99 {p99:.2f} ms   max {latencies[-1]:.2f} ms")
+    if failures:
+        print(f"{len(failures)} failed scans, e.g. {failures[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a local check-in server")
+    parser.add_argument("--db", default="gym_database.db", help="database to read member barcodes from")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stations", type=int, default=8)
+    parser.add_argument("--scans", type=int, default=500, help="scans per station")
+    parser.add_argument("--think-time", type=float, default=0, help="max random pause between scans (ms)")
+    args = parser.parse_args()
+
+    uri = Path(args.db).resolve().as_uri() + "?mode=ro"
+    with sqlite3.connect(uri, uri=True) as conn:
+        barcodes = [row[0] for row in conn.execute(
+            "SELECT barcode FROM members WHERE barcode IS NOT NULL ORDER BY RANDOM() LIMIT 10000")]
+    if not barcodes:
+        raise SystemExit("No member barcodes found in the database")
+    asyncio.run(run(args, barcodes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import argparse
+import asyncio
+import json
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from checkin_service import CheckInService
+from Database_manager import DatabaseManager
+
+# Headless check-in endpoint for turnstiles and scanner stations; never imports
+# PyQt. Stations either keep a TCP connection open and send one barcode per
+# line (one JSON object per line comes back), or make plain HTTP requests:
+#     GET /checkin?barcode=2000000000015
+# Scans from all stations are queued and committed in micro-batches. Sessions
+# nobody scanned out of are closed periodically, and writes made from the GUI
+# (new members, renewals, restores) are picked up by polling the database.
+
+
+class CheckInServer:
+    def __init__(self, service, max_batch=64, max_delay=0.005, stale_check_interval=300, sync_interval=1.0):
+        self.service = service
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.stale_check_interval = stale_check_interval
+        self.sync_interval = sync_interval
+        self.queue = None
+        # A single database thread: batches are already serialized by the writer
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batches = 0
+        self.scans = 0
+
+    async def check_in(self, barcode):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((barcode, future))
+        return await future
+
+    async def run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            barcodes = [barcode for barcode, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.service.check_in_many, barcodes)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.scans += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def close_stale_sessions(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(self.executor, self.service.close_stale_sessions)
+            except Exception as e:
+                print(f"Error closing stale sessions: {e}")
+            await asyncio.sleep(self.stale_check_interval)
+
+    async def sync(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await loop.run_in_executor(self.executor, self.service.sync)
+            except Exception as e:
+                print(f"Error checking for database changes: {e}")
+
+    async def respond(self, barcode):
+        barcode = (barcode or "").strip()
+        if not barcode:
+            return {"ok": False, "error": "empty barcode"}
+        try:
+            result = await self.check_in(barcode)
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+        if result is None:
+            return {"ok": False, "barcode": barcode, "error": "unknown barcode"}
+        return {"ok": True, **result._asdict()}
+
+    async def handle_client(self, reader, writer):
+        try:
+            first_line = await reader.readline()
+            if first_line.startswith((b"GET ", b"POST ")):
+                await self.handle_http(first_line, reader, writer)
+                return
+            line = first_line
+            while line:
+                response = await self.respond(line.decode("utf-8", "replace"))
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+                line = await reader.readline()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_http(self, request_line, reader, writer):
+        while (await reader.readline()).strip():
+            pass  # Headers are not needed
+        parts = request_line.split()
+        url = urlsplit(parts[1].decode("utf-8", "replace")) if len(parts) == 3 else None
+        if url is None:
+            body, status = {"ok": False, "error": "bad request"}, "400 Bad Request"
+        elif url.path != "/checkin":
+            body, status = {"ok": False, "error": "not found"}, "404 Not Found"
+        else:
+            body = await self.respond(parse_qs(url.query).get("barcode", [""])[0])
+            status = "200 OK"
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("ascii") + payload)
+        await writer.drain()
+
+    async def serve(self, host, port):
+        self.queue = asyncio.Queue()
+        batcher = asyncio.create_task(self.run_batches())
+        stale_sessions = asyncio.create_task(self.close_stale_sessions())
+        syncing = asyncio.create_task(self.sync())
+        server = await asyncio.start_server(self.handle_client, host, port)
+        serving = asyncio.create_task(server.serve_forever())
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            try:
+                asyncio.get_running_loop().add_signal_handler(signal_number, serving.cancel)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+        print(f"Check-in server listening on {host}:{port}")
+        try:
+            async with server:
+                await serving
+        except asyncio.CancelledError:
+            pass
+        finally:
+            batcher.cancel()
+            stale_sessions.cancel()
+            syncing.cancel()
+            self.executor.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless check-in server for scanner stations")
+    parser.add_argument("--db", default="gym_database.db")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-delay-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(args.db)
+    service = CheckInService(db_manager)
+    service.lookup("")  # Build the barcode index before the first scan arrives
+    server = CheckInServer(service, args.max_batch, args.max_delay_ms / 1000)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Processed {server.scans} scans in {server.batches} batches")
+        service.close()
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
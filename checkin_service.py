@@ -0,0 +1,252 @@
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from barcode_allocator import normalize_barcode
+from Database_manager import DELETE, INSERT, UPDATE
+from membership import subscription_status, remaining_days
+
+CheckInResult = namedtuple('CheckInResult', [
+    'member_id', 'name', 'barcode', 'end_date', 'status', 'remaining_days', 'visit_date'
+])
+
+# check_in is None when the member had no open session to close
+CheckOutResult = namedtuple('CheckOutResult', [
+    'member_id', 'name', 'barcode', 'check_in', 'check_out', 'minutes'
+])
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Sessions left open longer than this (nobody scanned out) are closed automatically
+STALE_SESSION_HOURS = 4
+
+
+# Front-desk fast path: barcodes resolve through an in-memory index (kept in
+# sync from DatabaseManager change events) and the visit row, the member's
+# counters and the visit session are written in a single transaction. Open
+# sessions are also kept in memory, which makes the live occupancy an O(1)
+# read. Deliberately free of Qt so the headless check-in server can use it too.
+class CheckInService:
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.by_barcode = None
+        self.barcode_by_id = {}
+        self.open_sessions = None  # member id -> (session id, check-in time)
+        self.version = db_manager.external_data_version()
+        db_manager.subscribe(self.on_change)
+
+    @property
+    def occupancy(self):
+        with self.lock:
+            if self.open_sessions is None:
+                self._load_open_sessions()
+            return len(self.open_sessions)
+
+    def close(self):
+        self.db_manager.unsubscribe(self.on_change)
+
+    def lookup(self, barcode):
+        with self.lock:
+            if self.by_barcode is None:
+                self._build_index()
+            barcode = normalize_barcode(barcode)
+            member = self.by_barcode.get(barcode)
+            if member is None and barcode:
+                # Possibly added by another process since the index was built
+                end_date = self.db_manager.dates.day_sql('end_date')
+                row = self.db_manager.fetch_one(
+                    f"SELECT id, barcode, name, {end_date} FROM members WHERE barcode = ?", (barcode,))
+                if row is not None:
+                    self._index(*row)
+                    member = self.by_barcode.get(barcode)
+            return member
+
+    def check_in(self, barcode, when=None):
+        return self.check_in_many([barcode], when)[0]
+
+    def check_in_many(self, barcodes, when=None):
+        # Group commit: every scan in the batch shares one transaction (one
+        # fsync). Unknown barcodes yield None in their slot.
+        when = when or datetime.now()
+        visit_date = when.strftime(TIMESTAMP_FORMAT)
+        today = when.date()
+        members = [self.lookup(barcode) for barcode in barcodes]
+        if not any(members):
+            return [None] * len(barcodes)
+
+        with self.lock:
+            if self.open_sessions is None:
+                self._load_open_sessions()
+            open_sessions = dict(self.open_sessions)
+
+        stored_visit_date = self.db_manager.dates.timestamp(visit_date)
+        visit_ids, session_ids = [], []
+        with self.db_manager.transaction() as conn:
+            for member in members:
+                if member is None:
+                    continue
+                member_id = member[0]
+                # Scanning in again without scanning out closes the old session
+                if member_id in open_sessions:
+                    conn.execute("UPDATE visit_sessions SET check_out = ?, closed_by = 'rescan' WHERE id = ?",
+                                 (visit_date, open_sessions[member_id][0]))
+                    session_ids.append(open_sessions[member_id][0])
+                visit_id = conn.execute(
+                    "INSERT INTO visits (member_id, visit_date) VALUES (?, ?)", (member_id, stored_visit_date)
+                ).lastrowid
+                conn.execute(
+                    "UPDATE members SET last_visit = ?, visits = visits + 1 WHERE id = ?",
+                    (stored_visit_date, member_id)
+                )
+                session_id = conn.execute(
+                    "INSERT INTO visit_sessions (member_id, visit_id, check_in) VALUES (?, ?, ?)",
+                    (member_id, visit_id, visit_date)
+                ).lastrowid
+                open_sessions[member_id] = (session_id, visit_date)
+                visit_ids.append(visit_id)
+                session_ids.append(session_id)
+
+        with self.lock:
+            if self.open_sessions is not None:  # Else reloaded from the database on next use
+                for member in members:
+                    if member is not None:
+                        self.open_sessions[member[0]] = open_sessions[member[0]]
+        self._publish('visits', INSERT, visit_ids)
+        self._publish('visit_sessions', INSERT, session_ids)
+        self._publish('members', UPDATE, sorted({member[0] for member in members if member}))
+
+        results = []
+        for barcode, member in zip(barcodes, members):
+            if member is None:
+                results.append(None)
+                continue
+            member_id, name, end_date = member
+            results.append(CheckInResult(member_id, name, normalize_barcode(barcode), end_date,
+                                         subscription_status(end_date, today),
+                                         remaining_days(end_date, today), visit_date))
+        return results
+
+    def check_out(self, barcode, when=None):
+        member = self.lookup(barcode)
+        if member is None:
+            return None
+        member_id, name, _ = member
+        when = when or datetime.now()
+        check_out = when.strftime(TIMESTAMP_FORMAT)
+
+        with self.lock:
+            if self.open_sessions is None:
+                self._load_open_sessions()
+            session = self.open_sessions.get(member_id)
+        if session is None:
+            # Possibly opened by another process (the check-in server) since
+            # the open sessions were last read
+            session = self.db_manager.fetch_one(
+                "SELECT id, check_in FROM visit_sessions WHERE member_id = ? AND check_out IS NULL "
+                "ORDER BY id DESC LIMIT 1", (member_id,))
+        if session is None:
+            return CheckOutResult(member_id, name, normalize_barcode(barcode), None, check_out, 0)
+
+        session_id, check_in = session
+        with self.db_manager.transaction() as conn:
+            conn.execute("UPDATE visit_sessions SET check_out = ?, closed_by = 'scan' WHERE id = ?",
+                         (check_out, session_id))
+        with self.lock:
+            if self.open_sessions is not None:
+                self.open_sessions.pop(member_id, None)
+        self._publish('visit_sessions', UPDATE, (session_id,))
+
+        minutes = int((when - datetime.strptime(check_in, TIMESTAMP_FORMAT)).total_seconds() // 60)
+        return CheckOutResult(member_id, name, normalize_barcode(barcode), check_in, check_out, minutes)
+
+    def close_stale_sessions(self, max_hours=STALE_SESSION_HOURS, now=None):
+        # Closes sessions nobody scanned out of, stamping them with the maximum
+        # duration, then re-reads the open sessions so the counter also picks
+        # up scans made by other processes (e.g. the check-in server).
+        cutoff = ((now or datetime.now()) - timedelta(hours=max_hours)).strftime(TIMESTAMP_FORMAT)
+        with self.db_manager.transaction() as conn:
+            closed = [row[0] for row in conn.execute(
+                "SELECT id FROM visit_sessions WHERE check_out IS NULL AND check_in < ?", (cutoff,))]
+            conn.execute(f"""UPDATE visit_sessions
+                             SET check_out = datetime(check_in, '+{int(max_hours)} hours'), closed_by = 'auto'
+                             WHERE check_out IS NULL AND check_in < ?""", (cutoff,))
+        with self.lock:
+            self._load_open_sessions()
+        if closed:
+            self._publish('visit_sessions', UPDATE, closed)
+        return len(closed)
+
+    def _publish(self, table, operation, keys):
+        # Our own check-ins do not change name, barcode or end date, so the
+        # index does not need to refresh for them.
+        self.local.publishing = True
+        try:
+            self.db_manager.notify_change(table, operation, keys)
+        finally:
+            self.local.publishing = False
+
+    def on_change(self, event):
+        if getattr(self.local, 'publishing', False):
+            return
+        if event.table == 'visit_sessions' and event.keys is None:
+            with self.lock:
+                self.open_sessions = None
+            return
+        if event.table != 'members':
+            return
+        with self.lock:
+            if self.by_barcode is None:
+                return
+            if event.keys is None:
+                self.by_barcode = None
+                self.barcode_by_id = {}
+                return
+            for member_id in event.keys:
+                self.by_barcode.pop(self.barcode_by_id.pop(member_id, None), None)
+            if event.operation == DELETE:
+                return
+            placeholders = ", ".join("?" * len(event.keys))
+            end_date = self.db_manager.dates.day_sql('end_date')
+            rows = self.db_manager.fetch_all(
+                f"SELECT id, barcode, name, {end_date} FROM members WHERE id IN ({placeholders})", event.keys)
+            for member_id, barcode, name, end_date in rows:
+                self._index(member_id, barcode, name, end_date)
+
+    def sync(self):
+        # Writes from other processes (the GUI, the check-in server, a restore
+        # or import run there) publish no change events here. Call this
+        # periodically: when the database stamp shows any, the index and the
+        # open sessions are dropped and reloaded on next use. Returns True
+        # when they were.
+        version = self.db_manager.external_data_version()
+        if version is None:
+            return False  # Writer busy; try again on the next call
+        with self.lock:
+            if version == self.version:
+                return False
+            self.version = version
+            self.by_barcode = None
+            self.barcode_by_id = {}
+            self.open_sessions = None
+        return True
+
+    def _load_open_sessions(self):
+        rows = self.db_manager.fetch_all(
+            "SELECT member_id, id, check_in FROM visit_sessions WHERE check_out IS NULL ORDER BY id")
+        self.open_sessions = {member_id: (session_id, check_in) for member_id, session_id, check_in in rows}
+
+    def _build_index(self):
+        self.by_barcode = {}
+        self.barcode_by_id = {}
+        end_date = self.db_manager.dates.day_sql('end_date')
+        rows = self.db_manager.fetch_all(
+            f"SELECT id, barcode, name, {end_date} FROM members WHERE barcode IS NOT NULL")
+        for member_id, barcode, name, end_date in rows:
+            self._index(member_id, barcode, name, end_date)
+
+    def _index(self, member_id, barcode, name, end_date):
+        if barcode:
+            self.by_barcode[barcode] = (member_id, name, end_date)
+            self.barcode_by_id[member_id] = barcode
@@ -0,0 +1,201 @@
+import csv
+import gzip
+import os
+
+from barcode_allocator import allocate_barcodes, normalize_barcode, reserve_barcodes
+from Database_manager import IMPORT
+from migrations import backfill_subscriptions
+
+
+def _int(value):
+    return int(value) if value not in ('', None) else None
+
+
+def _float(value):
+    return float(value) if value not in ('', None) else None
+
+
+def _text(value):
+    return value if value != '' else None
+
+
+def _member_row(row):
+    member_id, name, barcode, plan, start_date, end_date, last_visit, visits, phone, email = row
+    return (_int(member_id), name, normalize_barcode(barcode) or None, plan, _text(start_date), _text(end_date),
+            _text(last_visit), _int(visits) or 0, phone, email)
+
+
+def _plan_row(row):
+    plan_id, name, duration, price = row
+    return (_int(plan_id), name, _int(duration), _float(price))
+
+
+def _equipment_row(row):
+    equipment_id, name, status, last_maintenance = row
+    return (_int(equipment_id), name, status, _text(last_maintenance))
+
+
+def _visit_row(row):
+    visit_id, member_id, visit_date = row
+    return (_int(visit_id), _int(member_id), _text(visit_date))
+
+
+# Section title in the CSV -> (table, insert statement, column count, row coercion).
+# CSV dates are always ISO text; {day}/{timestamp} convert a parameter to the
+# database's date storage and {start_date} etc. convert a column back (see
+# _date_fields).
+IMPORT_SECTIONS = {
+    'Members': ('members',
+                "INSERT OR REPLACE INTO members (id, name, barcode, plan, start_date, end_date, last_visit, visits, phone, email) VALUES (?, ?, ?, ?, {day}, {day}, {timestamp}, ?, ?, ?)",
+                10, _member_row),
+    'Plans': ('plans',
+              "INSERT OR REPLACE INTO plans (id, name, duration, price) VALUES (?, ?, ?, ?)",
+              4, _plan_row),
+    'Equipment': ('equipment',
+                  "INSERT OR REPLACE INTO equipment (id, name, status, last_maintenance) VALUES (?, ?, ?, ?)",
+                  4, _equipment_row),
+    'Visits': ('visits',
+               "INSERT OR REPLACE INTO visits (id, member_id, visit_date) VALUES (?, ?, {timestamp})",
+               3, _visit_row),
+}
+
+# Section title, table, CSV header, streaming query
+EXPORT_SECTIONS = [
+    ('Members', 'members',
+     ['ID', 'Name', 'Barcode', 'Plan', 'Start Date', 'End Date', 'Last Visit', 'Visits', 'Phone', 'Email'],
+     "SELECT id, name, barcode, plan, {start_date}, {end_date}, {last_visit}, visits, phone, email FROM members ORDER BY id"),
+    ('Plans', 'plans',
+     ['ID', 'Name', 'Duration', 'Price'],
+     "SELECT id, name, duration, price FROM plans ORDER BY id"),
+    ('Equipment', 'equipment',
+     ['ID', 'Name', 'Status', 'Last Maintenance'],
+     "SELECT id, name, status, last_maintenance FROM equipment ORDER BY id"),
+    ('Visits', 'visits',
+     ['ID', 'Member ID', 'Visit Date'],
+     "SELECT id, member_id, {visit_date} FROM visits ORDER BY id"),
+]
+
+
+def _date_fields(dates):
+    return {
+        'day': dates.day_from_text_sql('?'),
+        'timestamp': dates.timestamp_from_text_sql('?'),
+        'start_date': dates.day_sql('start_date'),
+        'end_date': dates.day_sql('end_date'),
+        'last_visit': dates.timestamp_sql('last_visit'),
+        'visit_date': dates.timestamp_sql('visit_date'),
+    }
+
+
+def _assign_barcodes(conn, rows):
+    reserve_barcodes(conn, [row[2] for row in rows if row[2]])
+    missing = [index for index, row in enumerate(rows) if not row[2]]
+    for index, code in zip(missing, allocate_barcodes(conn, len(missing))):
+        rows[index] = rows[index][:2] + (code,) + rows[index][3:]
+
+
+def _decoded_lines(file):
+    for line in file:
+        yield line.decode('utf-8')
+
+
+def import_csv(db_manager, file_name, progress=None, batch_size=1000):
+    # The whole file is imported in one transaction: rows are sent in
+    # executemany batches and any bad row rolls back everything. Progress is
+    # the position in the file on disk, so it also works for .gz exports.
+    total_bytes = os.path.getsize(file_name)
+    date_fields = _date_fields(db_manager.dates)
+    counts = {}
+    with open(file_name, 'rb') as raw, db_manager.transaction() as conn:
+        file = gzip.GzipFile(fileobj=raw) if file_name.endswith('.gz') else raw
+        reader = csv.reader(_decoded_lines(file))
+        section = None
+        batch = []
+
+        def flush():
+            if batch and section[0] == 'members':
+                _assign_barcodes(conn, batch)
+            if batch:
+                db_manager.execute_many(section[1].format(**date_fields), batch, conn)
+                counts[section[0]] = counts.get(section[0], 0) + len(batch)
+                batch.clear()
+            if progress:
+                progress(raw.tell(), total_bytes)
+
+        for row in reader:
+            title = next((cell for cell in row if cell in IMPORT_SECTIONS), None)
+            if title:
+                flush()
+                section = IMPORT_SECTIONS[title]
+                next(reader, None)  # Skip header
+            elif section and len(row) == section[2]:
+                try:
+                    batch.append(section[3](row))
+                except ValueError as e:
+                    raise ValueError(f"Invalid value on CSV line {reader.line_num}: {e}")
+                if len(batch) >= batch_size:
+                    flush()
+        flush()
+        if 'members' in counts:
+            # Imported members have no ledger history; start one from their current plan
+            counts['subscriptions'] = backfill_subscriptions(conn)
+
+    for table in counts:
+        db_manager.notify_change(table, IMPORT)
+    return counts
+
+
+def _export_paths(file_name, compress):
+    if not compress:
+        return {section[1]: file_name for section in EXPORT_SECTIONS}
+    base = file_name
+    for suffix in ('.gz', '.csv'):
+        if base.endswith(suffix):
+            base = base[:-len(suffix)]
+    return {section[1]: f"{base}_{section[1]}.csv.gz" for section in EXPORT_SECTIONS}
+
+
+def _open_export(path, compress):
+    if compress:
+        return gzip.open(path, 'wt', newline='', encoding='utf-8', compresslevel=6)
+    return open(path, 'w', newline='', encoding='utf-8')
+
+
+def export_csv(db_manager, file_name, progress=None, chunk_size=5000, compress=False):
+    # Rows are streamed from a cursor in chunks, so memory stays constant no
+    # matter how many visits there are. All tables are read inside one read
+    # transaction, which gives a consistent snapshot while check-ins continue.
+    # With compress=True every table goes to its own gzip file.
+    paths = _export_paths(file_name, compress)
+    date_fields = _date_fields(db_manager.dates)
+    written = 0
+    with db_manager.reader_connection() as conn:
+        conn.execute("BEGIN")
+        file = None
+        try:
+            total = sum(conn.execute(f"SELECT COUNT(*) FROM {section[1]}").fetchone()[0]
+                        for section in EXPORT_SECTIONS)
+            for title, table, header, query in EXPORT_SECTIONS:
+                if file is None or compress:
+                    if file is not None:
+                        file.close()
+                    file = _open_export(paths[table], compress)
+                    writer = csv.writer(file)
+                else:
+                    writer.writerow([])
+                writer.writerow([title])
+                writer.writerow(header)
+                cursor = conn.execute(query.format(**date_fields))
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
+                    written += len(rows)
+                    if progress:
+                        progress(written, total)
+        finally:
+            if file is not None:
+                file.close()
+            conn.rollback()
+    return sorted(set(paths.values()))
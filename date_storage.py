@@ -0,0 +1,111 @@
+import calendar
+import sqlite3
+from datetime import date, datetime
+
+DATE_FORMAT = "%Y-%m-%d"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+TEXT_DATES = 'text'
+INTEGER_DATES = 'integer'
+# Set while convert_to_integer_dates is part way through
+CONVERTING_DATES = 'converting'
+
+SETTING_NAME = 'date_storage'
+
+_EPOCH = date(1970, 1, 1)
+_UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+
+# How members.start_date/end_date/last_visit and visits.visit_date are stored.
+# Text mode keeps the original ISO strings. Integer mode stores days since
+# 1970-01-01 and seconds since 1970-01-01 00:00:00 on the same local clock the
+# text used (no time zone conversion either way), which makes rows smaller and
+# range scans and rollups integer comparisons. Queries go through these thin
+# accessors so the UI and CSV files always see the ISO text.
+class TextDates:
+    mode = TEXT_DATES
+
+    # Python value -> stored value
+    def day(self, value):
+        if isinstance(value, datetime):
+            value = value.date()
+        return value.isoformat() if isinstance(value, date) else value
+
+    def timestamp(self, value):
+        return value.strftime(TIMESTAMP_FORMAT) if isinstance(value, datetime) else value
+
+    # Stored column -> ISO text
+    def day_sql(self, column):
+        return column
+
+    def timestamp_sql(self, column):
+        return column
+
+    # ISO text expression -> stored value
+    def day_from_text_sql(self, expression):
+        return expression
+
+    def timestamp_from_text_sql(self, expression):
+        return expression
+
+    # Stored timestamp column -> 'YYYY-MM-DD' of its day, and the stored
+    # bounds [start of that day, start of the next day)
+    def timestamp_day_sql(self, column):
+        return f"date({column})"
+
+    def timestamp_day_bounds_sql(self, column):
+        return f"date({column})", f"date({column}, '+1 day')"
+
+
+class IntegerDates(TextDates):
+    mode = INTEGER_DATES
+
+    def day(self, value):
+        if value is None or value == '':
+            return None
+        if isinstance(value, str):
+            value = datetime.strptime(value, DATE_FORMAT).date()
+        elif isinstance(value, datetime):
+            value = value.date()
+        return (value - _EPOCH).days
+
+    def timestamp(self, value):
+        if value is None or value == '':
+            return None
+        if isinstance(value, str):
+            value = datetime.strptime(value, TIMESTAMP_FORMAT)
+        return calendar.timegm(value.timetuple())
+
+    def day_sql(self, column):
+        return f"date({column} * 86400, 'unixepoch')"
+
+    def timestamp_sql(self, column):
+        return f"datetime({column}, 'unixepoch')"
+
+    def day_from_text_sql(self, expression):
+        return f"CAST(julianday(NULLIF({expression}, '')) - {_UNIX_EPOCH_JULIAN_DAY} AS INTEGER)"
+
+    def timestamp_from_text_sql(self, expression):
+        return f"CAST(strftime('%s', NULLIF({expression}, '')) AS INTEGER)"
+
+    def timestamp_day_sql(self, column):
+        return f"date({column}, 'unixepoch')"
+
+    def timestamp_day_bounds_sql(self, column):
+        return f"({column} - {column} % 86400)", f"({column} - {column} % 86400 + 86400)"
+
+
+def date_storage(conn):
+    # The codec for a database; text when the settings table predates it
+    try:
+        row = conn.execute("SELECT value FROM schema_settings WHERE name = ?", (SETTING_NAME,)).fetchone()
+    except sqlite3.OperationalError:
+        return TextDates()
+    mode = row[0] if row else TEXT_DATES
+    if mode == CONVERTING_DATES:
+        return None
+    return IntegerDates() if mode == INTEGER_DATES else TextDates()
+
+
+def set_date_storage(conn, mode):
+    conn.execute("INSERT OR REPLACE INTO schema_settings (name, value) VALUES (?, ?)", (SETTING_NAME, mode))
@@ -0,0 +1,214 @@
+import argparse
+import random
+import time
+from bisect import bisect
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+from barcode_allocator import allocate_barcodes
+from Database_manager import IMPORT, DatabaseManager
+from migrations import VISITS_DAILY_TRIGGERS, rebuild_visits_daily, visits_daily_triggers
+
+# Fills a scratch database with a reproducible synthetic gym: the same seed and
+# --today always produce the same rows. Members get Arabic names, a history of
+# subscriptions (so the revenue ledger has something to sum) and a skewed
+# activity level: a few regulars account for most visits. Visits follow the
+# morning and evening peaks of a real front desk, with a quieter Friday.
+#     python generate_dataset.py --db scratch.db --members 100000 --visits 10000000
+
+MALE_NAMES = ["محمد", "أحمد", "محمود", "مصطفى", "علي", "عمر", "يوسف", "خالد", "إبراهيم", "حسن",
+              "حسين", "عبدالله", "عبدالرحمن", "طارق", "كريم", "ياسر", "وليد", "سامي", "هشام", "أيمن",
+              "عمرو", "زياد", "مازن", "رامي", "شريف", "عادل", "سعيد", "فارس", "أنس", "بلال"]
+FEMALE_NAMES = ["فاطمة", "مريم", "نور", "سارة", "آية", "هبة", "منى", "ريم", "ياسمين", "دينا",
+                "سلمى", "ليلى", "هدى", "رنا", "نادية", "إيمان", "أسماء", "شيماء", "نهى", "جنى"]
+FAMILY_NAMES = ["عبدالعزيز", "السيد", "حسنين", "الشريف", "المصري", "عثمان", "سليمان", "منصور", "الجمال",
+                "عبدالحميد", "النجار", "الحداد", "رمضان", "شاهين", "العطار", "البنا", "الخطيب", "يونس",
+                "عبدالسلام", "فوزي", "زكي", "صالح", "بدر", "قاسم", "الفقي", "عيسى", "غنيم", "هلال"]
+
+# Name, duration in days, price; --plans takes the first N
+PLANS = [
+    ("شهري", 30, 300), ("ربع سنوي", 90, 800), ("نصف سنوي", 180, 1500), ("سنوي", 365, 2800),
+    ("أسبوعي", 7, 100), ("شهري طلاب", 30, 200), ("حصة واحدة", 1, 40), ("شهري مع مدرب", 30, 900),
+]
+# How often each plan is sold, same order as PLANS
+PLAN_WEIGHTS = [50, 15, 8, 5, 6, 12, 2, 2]
+
+EQUIPMENT = ["جهاز مشي", "دراجة ثابتة", "جهاز إليبتيكال", "جهاز تجديف", "بنش ضغط", "جهاز سحب ظهر",
+             "جهاز رجل أمامي", "جهاز رجل خلفي", "جهاز كابل", "سميث ماشين", "رف دمبل", "رف أوزان"]
+EQUIPMENT_STATUSES = ["صالح للاستخدام", "تحت الصيانة", "معطل"]
+EQUIPMENT_STATUS_WEIGHTS = [85, 10, 5]
+
+# Check-ins per hour of the day (the gym opens at 6 and closes at 23)
+HOUR_WEIGHTS = {6: 4, 7: 7, 8: 6, 9: 4, 10: 3, 11: 2, 12: 2, 13: 2, 14: 2, 15: 3,
+                16: 5, 17: 8, 18: 10, 19: 10, 20: 8, 21: 5, 22: 2}
+# Monday .. Sunday; Friday is the quiet day
+WEEKDAY_WEIGHTS = [10, 10, 10, 10, 6, 9, 10]
+
+
+def arabic_name(rng):
+    first = rng.choice(MALE_NAMES if rng.random() < 0.6 else FEMALE_NAMES)
+    return f"{first} {rng.choice(MALE_NAMES)} {rng.choice(FAMILY_NAMES)}"
+
+
+def phone_number(rng):
+    return f"01{rng.choice('0125')}{rng.randint(0, 99999999):08d}"
+
+
+def _seed_plans(conn, count):
+    plans = PLANS[:count] + [(f"خطة {index}", 30, 300) for index in range(len(PLANS) + 1, count + 1)]
+    weights = (PLAN_WEIGHTS + [1] * count)[:count]
+    for name, duration, price in plans:
+        if not conn.execute("SELECT 1 FROM plans WHERE name = ?", (name,)).fetchone():
+            conn.execute("INSERT INTO plans (name, duration, price) VALUES (?, ?, ?)", (name, duration, price))
+    rows = {name: (plan_id, duration, price)
+            for plan_id, name, duration, price in conn.execute("SELECT id, name, duration, price FROM plans")}
+    return [(name, *rows[name]) for name, _, _ in plans], weights
+
+
+def _member_history(rng, plan, today, days):
+    # Joined some time in the last `days` and renewed back to back, mostly
+    # without gaps; many have lapsed since.
+    name, plan_id, duration, price = plan
+    start = today - timedelta(days=rng.randint(0, days))
+    subscriptions = []
+    while True:
+        end = start + timedelta(days=duration)
+        subscriptions.append((plan_id, name, price, start, end))
+        if end > today or rng.random() < 0.35:
+            return subscriptions
+        start = end + timedelta(days=rng.choice((0, 0, 0, 1, 3, 10)))
+
+
+def generate(db_manager, members=1000, visits=100000, plans=6, equipment=30, days=365, seed=0,
+             today=None, batch_size=50000, progress=None):
+    # Returns the number of rows written per table. progress(stage, done, total)
+    rng = random.Random(seed)
+    today = today or datetime.now().date()
+    dates = db_manager.dates
+    counts = {'plans': 0, 'equipment': 0, 'members': 0, 'subscriptions': 0, 'visits': 0}
+
+    with db_manager.transaction() as conn:
+        plan_rows, plan_weights = _seed_plans(conn, max(plans, 1))
+        counts['plans'] = len(plan_rows)
+        conn.executemany(
+            "INSERT INTO equipment (name, status, last_maintenance) VALUES (?, ?, ?)",
+            [(f"{EQUIPMENT[index % len(EQUIPMENT)]} {index // len(EQUIPMENT) + 1}",
+              rng.choices(EQUIPMENT_STATUSES, EQUIPMENT_STATUS_WEIGHTS)[0],
+              (today - timedelta(days=rng.randint(0, 180))).isoformat())
+             for index in range(equipment)])
+        counts['equipment'] = equipment
+
+    member_ids = []
+    for offset in range(0, members, batch_size):
+        count = min(batch_size, members - offset)
+        with db_manager.transaction() as conn:
+            for code in allocate_barcodes(conn, count):
+                plan = rng.choices(plan_rows, plan_weights)[0]
+                history = _member_history(rng, plan, today, days)
+                _, name, _, start, end = history[-1]
+                email = f"member{code[-6:]}@example.com" if rng.random() < 0.3 else ""
+                member_id = conn.execute(
+                    """INSERT INTO members (name, barcode, plan, start_date, end_date, phone, email)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    (arabic_name(rng), code, name, dates.day(start), dates.day(end), phone_number(rng), email)
+                ).lastrowid
+                # The member row shows the last subscription; the ledger keeps them all
+                conn.executemany(
+                    """INSERT INTO subscriptions (member_id, plan_id, plan_name, price, start_date, end_date, created_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    [(member_id, plan_id, plan_name, price, start_date.isoformat(), end_date.isoformat(),
+                      f"{start_date.isoformat()} {rng.randint(9, 21):02d}:{rng.randint(0, 59):02d}:00")
+                     for plan_id, plan_name, price, start_date, end_date in history])
+                member_ids.append(member_id)
+                counts['subscriptions'] += len(history)
+        counts['members'] += count
+        if progress:
+            progress('members', counts['members'], members)
+
+    if visits and member_ids:
+        counts['visits'] = _generate_visits(db_manager, rng, member_ids, visits, today, days, batch_size, progress)
+
+    for table in ('plans', 'equipment', 'members', 'subscriptions', 'visits', 'visits_daily'):
+        db_manager.notify_change(table, IMPORT)
+    return counts
+
+
+def _generate_visits(db_manager, rng, member_ids, visits, today, days, batch_size, progress):
+    dates = db_manager.dates
+    activity = list(accumulate(rng.paretovariate(1.2) for _ in member_ids))
+    total_activity = activity[-1]
+    hours = list(HOUR_WEIGHTS)
+    hour_weights = list(accumulate(HOUR_WEIGHTS.values()))
+    first_day = today - timedelta(days=days - 1)
+    day_weights = list(accumulate(WEEKDAY_WEIGHTS[(first_day + timedelta(days=offset)).weekday()]
+                                  for offset in range(days)))
+    visit_counts = [0] * len(member_ids)
+    last_visits = [None] * len(member_ids)
+    epoch = datetime.combine(first_day, datetime.min.time())
+
+    # Bulk load: the per-row rollup triggers would dominate, so they are
+    # dropped for the duration and visits_daily is rebuilt once at the end.
+    with db_manager.transaction() as conn:
+        for trigger in VISITS_DAILY_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    try:
+        for offset in range(0, visits, batch_size):
+            count = min(batch_size, visits - offset)
+            rows = []
+            for _ in range(count):
+                index = bisect(activity, rng.random() * total_activity)
+                when = epoch + timedelta(days=bisect(day_weights, rng.random() * day_weights[-1]),
+                                         hours=hours[bisect(hour_weights, rng.random() * hour_weights[-1])],
+                                         seconds=rng.randint(0, 3599))
+                visit_counts[index] += 1
+                if last_visits[index] is None or when > last_visits[index]:
+                    last_visits[index] = when
+                rows.append((member_ids[index], dates.timestamp(when)))
+            with db_manager.transaction() as conn:
+                conn.executemany("INSERT INTO visits (member_id, visit_date) VALUES (?, ?)", rows)
+            if progress:
+                progress('visits', offset + count, visits)
+    finally:
+        with db_manager.transaction() as conn:
+            for trigger in visits_daily_triggers(dates):
+                conn.execute(trigger)
+            rebuild_visits_daily(conn, dates)
+
+    with db_manager.transaction() as conn:
+        conn.executemany(
+            "UPDATE members SET visits = visits + ?, last_visit = ? WHERE id = ?",
+            [(visit_count, dates.timestamp(last_visit), member_id)
+             for member_id, visit_count, last_visit in zip(member_ids, visit_counts, last_visits) if visit_count])
+    return visits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a scratch database with synthetic gym data")
+    parser.add_argument("--db", default="gym_database.db")
+    parser.add_argument("--members", type=int, default=10000)
+    parser.add_argument("--visits", type=int, default=1000000)
+    parser.add_argument("--plans", type=int, default=6)
+    parser.add_argument("--equipment", type=int, default=30)
+    parser.add_argument("--days", type=int, default=365, help="length of the membership and visit history")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--today", type=date.fromisoformat, help="YYYY-MM-DD the history ends on")
+    parser.add_argument("--append", action="store_true", help="add to a database that already has members")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(args.db)
+    if db_manager.get_total_members_count() and not args.append:
+        raise SystemExit(f"{args.db} already has members; use a scratch database or pass --append")
+
+    def progress(stage, done, total):
+        print(f"\r{stage}: {done}/{total}", end="\n" if done == total else "", flush=True)
+
+    started = time.perf_counter()
+    counts = generate(db_manager, args.members, args.visits, args.plans, args.equipment, args.days,
+                      args.seed, args.today, progress=progress)
+    print(", ".join(f"{count} {table}" for table, count in counts.items()),
+          f"in {time.perf_counter() - started:.1f}s")
+    db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
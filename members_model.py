@@ -0,0 +1,190 @@
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+from PyQt5.QtGui import QBrush, QColor
+
+from Database_manager import DELETE, INSERT
+from text_search import normalize_arabic
+
+HEADERS = [
+    "ID", "الاسم", "الباركود", "الخطة", "تاريخ البدء", "تاريخ الانتهاء",
+    "آخر زيارة", "عدد الزيارات", "رقم الهاتف", "البريد الإلكتروني",
+    "حالة الاشتراك", "الأيام المتبقية"
+]
+
+STATUS_COLUMN = 10
+REMAINING_DAYS_COLUMN = 11
+SEARCHABLE_COLUMNS = (1, 2, 8, 9)
+
+
+# Only member ids are kept for every row the view has scrolled through (8 bytes
+# each); full rows live in a bounded LRU cache and are re-read by id range when an
+# evicted page scrolls back into view. Status and remaining days arrive computed
+# by the query, against a date captured once per reload.
+class MembersTableModel(QAbstractTableModel):
+    def __init__(self, db_manager, page_size=200, cached_pages=5, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.page_size = page_size
+        self.cache_limit = page_size * cached_pages
+        self.search_term = ""
+        self.status_filter = ""
+        self._normalized_term = ""
+        self._ids = array('q')
+        self._rows = OrderedDict()
+        self._exhausted = False
+        self._today = datetime.now().date()
+        self._highlight = QBrush(QColor(255, 255, 0))
+
+    def reload(self, search_term=None, status_filter=None):
+        if search_term is not None:
+            self.search_term = search_term
+            self._normalized_term = normalize_arabic(search_term)
+        if status_filter is not None:
+            self.status_filter = status_filter
+        self.beginResetModel()
+        self._ids = array('q')
+        self._rows.clear()
+        self._exhausted = False
+        self._today = datetime.now().date()
+        self._append_page()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ids)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return QVariant()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.BackgroundRole):
+            return QVariant()
+        member = self.member_at(index.row())
+        if member is None:
+            return QVariant()
+        text = self._cell_text(member, index.column())
+        if role == Qt.BackgroundRole:
+            if self._normalized_term and index.column() in SEARCHABLE_COLUMNS \
+                    and self._normalized_term in normalize_arabic(text):
+                return self._highlight
+            return QVariant()
+        return text
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        rows = self._load_page_after(self._ids[-1] if self._ids else 0)
+        if not rows:
+            return
+        first = len(self._ids)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._store_rows(rows)
+        self.endInsertRows()
+
+    def apply_change(self, event):
+        # Patch only the rows named by a change event; bulk or unkeyed changes
+        # fall back to a reload, which is cheaper than thousands of row inserts.
+        if event.keys is None or len(event.keys) > self.page_size:
+            self.reload()
+            return
+        if event.operation == DELETE:
+            for member_id in event.keys:
+                self._remove_row(member_id)
+            return
+
+        fetched = {member[0]: member for member in
+                   self.db_manager.get_members_by_ids(event.keys, self.search_term, self.status_filter, self._today)}
+        for member_id in event.keys:
+            member = fetched.get(member_id)
+            row = self.row_of(member_id)
+            if member is None:
+                # Deleted meanwhile, or no longer matches the active search or filter
+                self._remove_row(member_id)
+            elif row is not None:
+                self._cache(member)
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(HEADERS) - 1))
+            elif event.operation == INSERT or self.search_term or self.status_filter:
+                self._insert_row(member)
+
+    def member_at(self, row):
+        if row < 0 or row >= len(self._ids):
+            return None
+        member_id = self._ids[row]
+        member = self._rows.get(member_id)
+        if member is None:
+            self._load_page_for_row(row)
+            member = self._rows.get(member_id)
+        else:
+            self._rows.move_to_end(member_id)
+        return member
+
+    def member_id_at(self, row):
+        return self._ids[row] if 0 <= row < len(self._ids) else None
+
+    def row_of(self, member_id):
+        row = bisect_left(self._ids, member_id)
+        if row < len(self._ids) and self._ids[row] == member_id:
+            return row
+        return None
+
+    def _cell_text(self, member, column):
+        value = member[column]
+        return "" if value is None else str(value)
+
+    def _remove_row(self, member_id):
+        row = self.row_of(member_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._ids[row]
+        self._rows.pop(member_id, None)
+        self.endRemoveRows()
+
+    def _insert_row(self, member):
+        row = bisect_left(self._ids, member[0])
+        if row == len(self._ids) and not self._exhausted:
+            # Beyond the loaded window; fetchMore will pick it up in order
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._ids.insert(row, member[0])
+        self._cache(member)
+        self.endInsertRows()
+
+    def _append_page(self):
+        self._store_rows(self._load_page_after(0))
+
+    def _load_page_after(self, after_id):
+        rows = self.db_manager.get_members_page(after_id, self.page_size, self.search_term,
+                                                self.status_filter, self._today)
+        if len(rows) < self.page_size:
+            self._exhausted = True
+        return rows
+
+    def _store_rows(self, rows):
+        for member in rows:
+            self._ids.append(member[0])
+            self._cache(member)
+
+    def _load_page_for_row(self, row):
+        start = row - row % self.page_size
+        end = min(start + self.page_size, len(self._ids)) - 1
+        for member in self.db_manager.get_members_range(self._ids[start], self._ids[end], self.search_term,
+                                                        self.status_filter, self._today):
+            self._cache(member)
+
+    def _cache(self, member):
+        self._rows[member[0]] = member
+        self._rows.move_to_end(member[0])
+        while len(self._rows) > self.cache_limit:
+            self._rows.popitem(last=False)
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+STATUS_ACTIVE = "نشط"
+STATUS_EXPIRING = "على وشك الانتهاء"
+STATUS_EXPIRED = "منتهي"
+STATUS_UNKNOWN = "غير محدد"
+
+EXPIRING_WINDOW_DAYS = 7
+
+
+def subscription_status(end_date, today=None):
+    if not end_date:
+        return STATUS_UNKNOWN
+    today = today or datetime.now().date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    if end < today:
+        return STATUS_EXPIRED
+    elif (end - today).days <= EXPIRING_WINDOW_DAYS:
+        return STATUS_EXPIRING
+    else:
+        return STATUS_ACTIVE
+
+
+def remaining_days(end_date, today=None):
+    if not end_date:
+        return STATUS_UNKNOWN
+    today = today or datetime.now().date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    return max(0, (end - today).days)
+
+
+# Set-based versions of the two functions above for member queries. Statuses
+# are plain comparisons of the stored end_date against two bounds computed once
+# per refresh (encoded like the column, see date_storage), so filters on them
+# are range scans of idx_members_end_date.
+
+def status_bounds(today=None):
+    today = today or datetime.now().date()
+    return today.isoformat(), (today + timedelta(days=EXPIRING_WINDOW_DAYS)).isoformat()
+
+
+def status_sql(column):
+    # Parameters: the stored today and expiring_until bounds
+    return f"""CASE WHEN {column} IS NULL OR {column} = '' THEN '{STATUS_UNKNOWN}'
+        WHEN {column} < ? THEN '{STATUS_EXPIRED}'
+        WHEN {column} <= ? THEN '{STATUS_EXPIRING}'
+        ELSE '{STATUS_ACTIVE}' END"""
+
+
+def remaining_days_sql(column):
+    # column is an ISO text expression; parameter: today as ISO text
+    return f"""CASE WHEN {column} IS NULL OR {column} = '' THEN '{STATUS_UNKNOWN}'
+        ELSE MAX(0, CAST(julianday({column}) - julianday(?) AS INTEGER)) END"""
+
+
+def status_filter_sql(column, status, bounds):
+    # Returns (condition, parameters) selecting members with the given status;
+    # bounds are the stored today and expiring_until
+    today, expiring_until = bounds
+    if status == STATUS_EXPIRED:
+        return f"{column} < ? AND {column} <> ''", (today,)
+    if status == STATUS_EXPIRING:
+        return f"{column} BETWEEN ? AND ?", (today, expiring_until)
+    if status == STATUS_ACTIVE:
+        return f"{column} > ?", (expiring_until,)
+    if status == STATUS_UNKNOWN:
+        return f"({column} IS NULL OR {column} = '')", ()
+    raise ValueError(f"Unknown subscription status: {status}")
@@ -0,0 +1,411 @@
+import argparse
+import re
+import sqlite3
+from datetime import datetime
+
+from barcode_allocator import migrate_member_barcodes
+from date_storage import (CONVERTING_DATES, INTEGER_DATES, IntegerDates, TextDates, date_storage,
+                          set_date_storage)
+
+# Whether a member already has another visit on the visit's day; relies on
+# idx_visits_member_date and compares the stored values so the index is usable.
+_OTHER_VISIT_SAME_DAY = """EXISTS (SELECT 1 FROM visits
+    WHERE member_id = {row}.member_id
+      AND visit_date >= {day_start}
+      AND visit_date < {next_day_start}
+      AND id != {row}.id)"""
+
+# No conflict clauses here: an outer INSERT OR REPLACE on visits would
+# override them inside the trigger and reset the day's row.
+_VISITS_DAILY_ADD = """
+    UPDATE visits_daily SET visit_count = visit_count + 1,
+        unique_members = unique_members + NOT {other}
+    WHERE day = {day};
+    INSERT INTO visits_daily (day, visit_count, unique_members)
+    SELECT {day}, 1, 1
+    WHERE NOT EXISTS (SELECT 1 FROM visits_daily WHERE day = {day});
+"""
+
+_VISITS_DAILY_REMOVE = """
+    UPDATE visits_daily SET visit_count = visit_count - 1,
+        unique_members = unique_members - NOT {other}
+    WHERE day = {day};
+    DELETE FROM visits_daily WHERE day = {day} AND visit_count <= 0;
+"""
+
+VISITS_DAILY_TRIGGERS = ('visits_daily_insert', 'visits_daily_delete',
+                         'visits_daily_update_old', 'visits_daily_update_new')
+
+
+def _visits_daily_body(template, row, dates):
+    day_start, next_day_start = dates.timestamp_day_bounds_sql(f'{row}.visit_date')
+    other = _OTHER_VISIT_SAME_DAY.format(row=row, day_start=day_start, next_day_start=next_day_start)
+    return template.format(other=other, day=dates.timestamp_day_sql(f'{row}.visit_date'))
+
+
+def visits_daily_triggers(dates):
+    add = _visits_daily_body(_VISITS_DAILY_ADD, 'new', dates)
+    remove = _visits_daily_body(_VISITS_DAILY_REMOVE, 'old', dates)
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS visits_daily_insert AFTER INSERT ON visits
+            WHEN new.visit_date IS NOT NULL BEGIN {add} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS visits_daily_delete AFTER DELETE ON visits
+            WHEN old.visit_date IS NOT NULL BEGIN {remove} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS visits_daily_update_old AFTER UPDATE OF member_id, visit_date ON visits
+            WHEN old.visit_date IS NOT NULL BEGIN {remove} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS visits_daily_update_new AFTER UPDATE OF member_id, visit_date ON visits
+            WHEN new.visit_date IS NOT NULL BEGIN {add} END""",
+    ]
+
+
+# Revenue is booked in the month a subscription starts, per plan id (0 when
+# the plan no longer exists). plan_name keeps the last name seen so deleted
+# plans still have a label.
+_REVENUE_MONTHLY_ADD = """
+    UPDATE revenue_monthly SET subscriptions = subscriptions + 1,
+        revenue = revenue + COALESCE(new.price, 0), plan_name = new.plan_name
+    WHERE month = substr(new.start_date, 1, 7) AND plan_id = COALESCE(new.plan_id, 0);
+    INSERT INTO revenue_monthly (month, plan_id, plan_name, subscriptions, revenue)
+    SELECT substr(new.start_date, 1, 7), COALESCE(new.plan_id, 0), new.plan_name, 1, COALESCE(new.price, 0)
+    WHERE NOT EXISTS (SELECT 1 FROM revenue_monthly
+                      WHERE month = substr(new.start_date, 1, 7) AND plan_id = COALESCE(new.plan_id, 0));
+"""
+
+_REVENUE_MONTHLY_REMOVE = """
+    UPDATE revenue_monthly SET subscriptions = subscriptions - 1,
+        revenue = revenue - COALESCE(old.price, 0)
+    WHERE month = substr(old.start_date, 1, 7) AND plan_id = COALESCE(old.plan_id, 0);
+    DELETE FROM revenue_monthly
+    WHERE month = substr(old.start_date, 1, 7) AND plan_id = COALESCE(old.plan_id, 0) AND subscriptions <= 0;
+"""
+
+
+def backfill_subscriptions(conn):
+    # Members without any ledger row get one for their current plan at the
+    # plan's current price: the best record there is of what they paid. The
+    # ledger keeps ISO text dates whatever the member date storage.
+    dates = date_storage(conn) or TextDates()
+    start_date, end_date = dates.day_sql('m.start_date'), dates.day_sql('m.end_date')
+    return conn.execute(f"""INSERT INTO subscriptions (member_id, plan_id, plan_name, price, start_date, end_date, created_at)
+        SELECT m.id, p.id, m.plan, COALESCE(p.price, 0), {start_date}, {end_date}, {start_date}
+        FROM members m LEFT JOIN plans p ON p.name = m.plan
+        WHERE m.start_date IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM subscriptions s WHERE s.member_id = m.id)
+        ORDER BY m.id""").rowcount
+
+
+def rebuild_revenue_monthly(conn):
+    conn.execute("DELETE FROM revenue_monthly")
+    conn.execute("""INSERT INTO revenue_monthly (month, plan_id, plan_name, subscriptions, revenue)
+        SELECT substr(start_date, 1, 7), COALESCE(plan_id, 0), MAX(plan_name), COUNT(*), SUM(COALESCE(price, 0))
+        FROM subscriptions WHERE start_date IS NOT NULL
+        GROUP BY substr(start_date, 1, 7), COALESCE(plan_id, 0)""")
+
+
+def rebuild_visits_daily(conn, dates=None):
+    day = (dates or date_storage(conn)).timestamp_day_sql('visit_date')
+    conn.execute("DELETE FROM visits_daily")
+    conn.execute(f"""INSERT INTO visits_daily (day, visit_count, unique_members)
+        SELECT {day}, COUNT(*), COUNT(DISTINCT member_id)
+        FROM visits WHERE visit_date IS NOT NULL
+        GROUP BY {day}""")
+
+
+# Ordered schema migrations applied on top of the baseline tables created by
+# DatabaseManager.create_tables. Each entry is (version, description, steps);
+# a step is an SQL statement or a callable taking the connection. Steps must be
+# idempotent so a database that was upgraded by an older build (or interrupted
+# half-way) can be migrated again safely.
+MIGRATIONS = [
+    (1, "Index visits by date", [
+        "CREATE INDEX IF NOT EXISTS idx_visits_visit_date ON visits (visit_date)",
+    ]),
+    (2, "Index visits by member and date", [
+        "CREATE INDEX IF NOT EXISTS idx_visits_member_date ON visits (member_id, visit_date)",
+    ]),
+    (3, "Index members by subscription end date", [
+        "CREATE INDEX IF NOT EXISTS idx_members_end_date ON members (end_date)",
+    ]),
+    (4, "Index members by plan", [
+        "CREATE INDEX IF NOT EXISTS idx_members_plan ON members (plan)",
+    ]),
+    (5, "Sequence-based EAN-13 member barcodes", [
+        migrate_member_barcodes,
+    ]),
+    (6, "Full-text member search with Arabic normalization", [
+        # Holds normalize_ar() copies of the searchable fields, keyed by member id
+        """CREATE VIRTUAL TABLE IF NOT EXISTS members_fts USING fts5(
+            name, phone, barcode, email,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3 4'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS members_fts_insert AFTER INSERT ON members BEGIN
+            INSERT INTO members_fts (rowid, name, phone, barcode, email)
+            VALUES (new.id, normalize_ar(new.name), normalize_ar(new.phone),
+                    new.barcode, normalize_ar(new.email));
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS members_fts_delete AFTER DELETE ON members BEGIN
+            DELETE FROM members_fts WHERE rowid = old.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS members_fts_update
+            AFTER UPDATE OF id, name, phone, barcode, email ON members BEGIN
+            DELETE FROM members_fts WHERE rowid = old.id;
+            INSERT INTO members_fts (rowid, name, phone, barcode, email)
+            VALUES (new.id, normalize_ar(new.name), normalize_ar(new.phone),
+                    new.barcode, normalize_ar(new.email));
+        END""",
+        "DELETE FROM members_fts",
+        """INSERT INTO members_fts (rowid, name, phone, barcode, email)
+           SELECT id, normalize_ar(name), normalize_ar(phone), barcode, normalize_ar(email) FROM members""",
+    ]),
+    (7, "Daily visit rollup maintained by triggers", [
+        """CREATE TABLE IF NOT EXISTS visits_daily (
+            day TEXT PRIMARY KEY,
+            visit_count INTEGER NOT NULL,
+            unique_members INTEGER NOT NULL
+        )""",
+        # Databases always start with text dates; convert_to_integer_dates
+        # swaps these triggers for integer ones.
+        *visits_daily_triggers(TextDates()),
+        lambda conn: rebuild_visits_daily(conn, TextDates()),
+    ]),
+    (8, "Visit sessions with check-out time", [
+        """CREATE TABLE IF NOT EXISTS visit_sessions (
+            id INTEGER PRIMARY KEY,
+            member_id INTEGER NOT NULL,
+            visit_id INTEGER,
+            check_in TEXT NOT NULL,
+            check_out TEXT,
+            closed_by TEXT,
+            FOREIGN KEY (member_id) REFERENCES members (id),
+            FOREIGN KEY (visit_id) REFERENCES visits (id)
+        )""",
+        # Partial indexes: only the handful of currently open sessions are indexed
+        """CREATE INDEX IF NOT EXISTS idx_visit_sessions_open_member
+            ON visit_sessions (member_id) WHERE check_out IS NULL""",
+        """CREATE INDEX IF NOT EXISTS idx_visit_sessions_open_check_in
+            ON visit_sessions (check_in) WHERE check_out IS NULL""",
+    ]),
+    (9, "Subscriptions ledger with monthly revenue rollup", [
+        # Price and plan name are copied at sale time so later plan edits do
+        # not rewrite past revenue.
+        """CREATE TABLE IF NOT EXISTS subscriptions (
+            id INTEGER PRIMARY KEY,
+            member_id INTEGER NOT NULL,
+            plan_id INTEGER,
+            plan_name TEXT,
+            price REAL NOT NULL DEFAULT 0,
+            start_date TEXT NOT NULL,
+            end_date TEXT,
+            created_at TEXT,
+            FOREIGN KEY (member_id) REFERENCES members (id),
+            FOREIGN KEY (plan_id) REFERENCES plans (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_subscriptions_member ON subscriptions (member_id)",
+        "CREATE INDEX IF NOT EXISTS idx_subscriptions_start_date ON subscriptions (start_date)",
+        """CREATE TABLE IF NOT EXISTS revenue_monthly (
+            month TEXT NOT NULL,
+            plan_id INTEGER NOT NULL,
+            plan_name TEXT,
+            subscriptions INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, plan_id)
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS revenue_monthly_insert AFTER INSERT ON subscriptions
+            WHEN new.start_date IS NOT NULL BEGIN {_REVENUE_MONTHLY_ADD} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS revenue_monthly_delete AFTER DELETE ON subscriptions
+            WHEN old.start_date IS NOT NULL BEGIN {_REVENUE_MONTHLY_REMOVE} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS revenue_monthly_update_old AFTER UPDATE OF plan_id, price, start_date ON subscriptions
+            WHEN old.start_date IS NOT NULL BEGIN {_REVENUE_MONTHLY_REMOVE} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS revenue_monthly_update_new AFTER UPDATE OF plan_id, price, start_date ON subscriptions
+            WHEN new.start_date IS NOT NULL BEGIN {_REVENUE_MONTHLY_ADD} END""",
+        backfill_subscriptions,
+        rebuild_revenue_monthly,
+    ]),
+    (10, "Storage settings", [
+        """CREATE TABLE IF NOT EXISTS schema_settings (
+            name TEXT PRIMARY KEY,
+            value TEXT
+        )""",
+        "INSERT OR IGNORE INTO schema_settings (name, value) VALUES ('date_storage', 'text')",
+    ]),
+]
+
+
+# Date columns switched to INTEGER affinity by convert_to_integer_dates. The
+# tables have to be rebuilt: a TEXT column would store the integers as text.
+_INTEGER_DATE_COLUMNS = {
+    'members': {'start_date': 'day', 'end_date': 'day', 'last_visit': 'timestamp'},
+    'visits': {'visit_date': 'timestamp'},
+}
+
+# Other processes may keep writing while the batches are copied. Rows added
+# meanwhile are copied again inside the swap transaction; members rows are
+# also updated in place (renewals, check-ins), so that table is copied again
+# in full there. Visits are only ever appended.
+_UPDATED_IN_PLACE = {'members'}
+
+
+def _rebuild_with_integer_dates(conn, table, columns, dates, batch_size, progress):
+    # Copies the table in id batches into <table>_integer_dates (resuming from
+    # what an interrupted run already copied), then catches up with writes
+    # made meanwhile and swaps it in with the original indexes and triggers,
+    # all in one transaction.
+    staging = f"{table}_integer_dates"
+    table_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                             (table,)).fetchone()[0]
+    staging_sql = re.sub(rf"^CREATE TABLE\s+{table}\b", f"CREATE TABLE IF NOT EXISTS {staging}", table_sql)
+    for column in columns:
+        staging_sql = re.sub(rf"\b{column}\s+TEXT\b", f"{column} INTEGER", staging_sql)
+    conn.execute(staging_sql)
+    conn.commit()
+
+    names = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    converters = {'day': dates.day_from_text_sql, 'timestamp': dates.timestamp_from_text_sql}
+    select = ", ".join(
+        f"CASE typeof({name}) WHEN 'text' THEN {converters[columns[name]](name)} ELSE {name} END"
+        if name in columns else name
+        for name in names)
+    copied = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {staging}").fetchone()[0]
+    last_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+    for first in range(copied, last_id, batch_size):
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(f"INSERT INTO {staging} ({', '.join(names)}) SELECT {select} FROM {table} "
+                     f"WHERE id > ? AND id <= ?", (first, first + batch_size))
+        conn.commit()
+        if progress:
+            progress(table, min(first + batch_size, last_id), last_id)
+
+    conn.execute("BEGIN IMMEDIATE")
+    columns_sql = ", ".join(names)
+    if table in _UPDATED_IN_PLACE:
+        conn.execute(f"DELETE FROM {staging}")
+        conn.execute(f"INSERT INTO {staging} ({columns_sql}) SELECT {select} FROM {table}")
+    else:
+        copied = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {staging}").fetchone()[0]
+        conn.execute(f"INSERT INTO {staging} ({columns_sql}) SELECT {select} FROM {table} WHERE id > ?",
+                     (copied,))
+    dependents = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table,))]
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+    for sql in dependents:
+        conn.execute(sql)
+    conn.commit()
+
+
+def convert_to_integer_dates(conn, batch_size=10000, progress=None):
+    # Opt-in switch to integer date storage. Rows are copied in batches that
+    # commit on their own, so the write lock is released in between; the
+    # 'converting' mode makes any process that opens the database resume the
+    # run instead of using it half-converted. Writes made by other processes
+    # during the copy are carried over at the swap, but those processes keep
+    # the date codec they started with, so restart them afterwards (or run
+    # this with the application and the check-in server closed).
+    # progress(table, copied, total) is called after every batch.
+    dates = date_storage(conn)
+    if dates is not None and dates.mode == INTEGER_DATES:
+        return False
+    integer_dates = IntegerDates()
+
+    conn.execute("BEGIN IMMEDIATE")
+    for trigger in VISITS_DAILY_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    set_date_storage(conn, CONVERTING_DATES)
+    conn.commit()
+
+    for table, columns in _INTEGER_DATE_COLUMNS.items():
+        column_type = conn.execute(f"SELECT type FROM pragma_table_info('{table}') WHERE name = ?",
+                                   (next(iter(columns)),)).fetchone()[0]
+        if column_type.upper() != 'INTEGER':  # Not swapped in yet
+            _rebuild_with_integer_dates(conn, table, columns, integer_dates, batch_size, progress)
+
+    conn.execute("BEGIN IMMEDIATE")
+    for trigger in visits_daily_triggers(integer_dates):
+        conn.execute(trigger)
+    rebuild_visits_daily(conn, integer_dates)
+    set_date_storage(conn, INTEGER_DATES)
+    conn.commit()
+    return True
+
+
+def ensure_version_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at TEXT
+    )''')
+
+
+def current_version(conn):
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn, migrations=MIGRATIONS):
+    ensure_version_table(conn)
+    conn.commit()
+    applied = []
+    for version, description, steps in sorted(migrations, key=lambda migration: migration[0]):
+        if version <= current_version(conn):
+            continue
+        # IMMEDIATE takes the write lock up front, so two processes starting at
+        # once cannot both run the same step; the loser re-checks the version.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version <= current_version(conn):
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            conn.commit()
+        except BaseException:
+            # Callable steps can fail with anything; never leave the writer
+            # inside the transaction
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upgrade or repair the gym database schema")
+    parser.add_argument("--db", default="gym_database.db")
+    parser.add_argument("--rebuild-visits-daily", action="store_true",
+                        help="recompute the visits_daily rollup from the visits table")
+    parser.add_argument("--rebuild-revenue-monthly", action="store_true",
+                        help="recompute the revenue_monthly rollup from the subscriptions ledger")
+    parser.add_argument("--integer-dates", action="store_true",
+                        help="convert member and visit dates to compact integer storage (close the app first)")
+    args = parser.parse_args()
+
+    from Database_manager import DatabaseManager
+    db_manager = DatabaseManager(args.db)  # Opening the database applies pending migrations
+    print(f"Schema version: {db_manager.get_schema_version()}")
+    if args.integer_dates:
+        def report(table, done, total):
+            print(f"\r{table}: {done}/{total} rows", end="\n" if done == total else "", flush=True)
+
+        if db_manager.convert_to_integer_dates(progress=report):
+            print("Dates converted to integer storage; run VACUUM to reclaim the freed space")
+        else:
+            print("Dates already use integer storage")
+    if args.rebuild_visits_daily:
+        db_manager.rebuild_visits_daily()
+        print("visits_daily rebuilt")
+    if args.rebuild_revenue_monthly:
+        db_manager.rebuild_revenue_monthly()
+        print("revenue_monthly rebuilt")
+    db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
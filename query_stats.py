@@ -0,0 +1,150 @@
+import json
+import re
+import threading
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+
+# Upper bounds (ms) of the latency histogram buckets; the last one catches the rest
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+SLOW_QUERY_MS = 100
+SLOW_LOG_SIZE = 100
+
+
+@lru_cache(maxsize=1024)
+def statement_key(query):
+    # One entry per statement shape: whitespace collapsed and IN lists of any
+    # length folded into one, so get_members_by_ids does not spawn an entry
+    # per page size.
+    key = " ".join(query.split())
+    return re.sub(r"\?(\s*,\s*\?)+", "?, ...", key)
+
+
+class StatementStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.rows = 0
+        self.histogram = [0] * len(BUCKETS_MS)
+
+    def add(self, seconds, wait_seconds, rows, failed):
+        self.calls += 1
+        self.errors += failed
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.wait_seconds += wait_seconds
+        self.rows += rows or 0
+        milliseconds = seconds * 1000
+        self.histogram[next(index for index, bound in enumerate(BUCKETS_MS) if milliseconds <= bound)] += 1
+
+    def percentile_ms(self, fraction):
+        # Upper bound of the bucket holding that fraction of the calls
+        target = self.calls * fraction
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.histogram):
+            seen += count
+            if count and seen >= target:
+                return min(bound, self.max_seconds * 1000)
+        return self.max_seconds * 1000
+
+    def as_dict(self, statement):
+        return {
+            'statement': statement,
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': self.total_seconds * 1000,
+            'mean_ms': self.total_seconds * 1000 / self.calls if self.calls else 0.0,
+            'p95_ms': self.percentile_ms(0.95),
+            'max_ms': self.max_seconds * 1000,
+            'pool_wait_ms': self.wait_seconds * 1000,
+            'rows': self.rows,
+            'histogram': {('inf' if bound == float('inf') else str(bound)): count
+                          for bound, count in zip(BUCKETS_MS, self.histogram) if count},
+        }
+
+
+# Opt-in statement statistics for DatabaseManager: calls, latency histogram,
+# time spent waiting for a pooled connection and rows returned (or changed)
+# per statement, plus a bounded log of statements slower than the threshold
+# with their EXPLAIN QUERY PLAN. Off by default; when off, recording costs
+# one attribute check per query.
+class QueryStats:
+    def __init__(self, enabled=False, slow_query_ms=SLOW_QUERY_MS, slow_log_size=SLOW_LOG_SIZE):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.lock = threading.Lock()
+        self.statements = {}
+        self.slow_log = deque(maxlen=slow_log_size)
+        self.started = datetime.now()
+
+    def is_slow(self, seconds):
+        return seconds * 1000 >= self.slow_query_ms
+
+    def record(self, query, seconds, wait_seconds=0.0, rows=0, failed=False, parameters=(), plan=None):
+        key = statement_key(query)
+        with self.lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                stats = self.statements[key] = StatementStats()
+            stats.add(seconds, wait_seconds, rows, failed)
+            if plan is not None:
+                self.slow_log.append({
+                    'time': datetime.now().isoformat(timespec='seconds'),
+                    'statement': key,
+                    'parameters': [_short(value) for value in parameters],
+                    'ms': seconds * 1000,
+                    'rows': rows,
+                    'plan': plan,
+                })
+
+    def reset(self):
+        with self.lock:
+            self.statements.clear()
+            self.slow_log.clear()
+            self.started = datetime.now()
+
+    def snapshot(self):
+        # Statements sorted by total time, heaviest first
+        with self.lock:
+            rows = [stats.as_dict(statement) for statement, stats in self.statements.items()]
+            slow = list(self.slow_log)
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        return rows, slow
+
+    def dump(self, file_name, pool_stats=None):
+        statements, slow = self.snapshot()
+        with open(file_name, 'w', encoding='utf-8') as file:
+            json.dump({
+                'since': self.started.isoformat(timespec='seconds'),
+                'written': datetime.now().isoformat(timespec='seconds'),
+                'slow_query_ms': self.slow_query_ms,
+                'pool': pool_stats or {},
+                'statements': statements,
+                'slow_queries': slow,
+            }, file, ensure_ascii=False, indent=2)
+
+
+def explain(conn, query, parameters):
+    # EXPLAIN QUERY PLAN rows as indented detail lines
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", parameters).fetchall()
+    except Exception as e:
+        return [f"(no plan: {e})"]
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def _short(value, limit=80):
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, str) and len(value) > limit:
+        return value[:limit] + "..."
+    return value if isinstance(value, (int, float, str)) or value is None else repr(value)
@@ -0,0 +1,52 @@
+from collections import OrderedDict
+import threading
+
+
+# Rendered reports keyed on (report type, parameters). Each entry remembers the
+# DatabaseManager.data_version() it was built from, so a lookup after any write
+# misses and the stale entry is dropped. on_evict releases whatever the entry
+# holds (figures, canvases) as soon as it leaves the cache.
+class ReportCache:
+    def __init__(self, max_entries=8, on_evict=None):
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            stale = self.entries.pop(key, None)
+        if stale is not None:
+            self._evict(stale[1])
+        return None
+
+    def put(self, key, version, value):
+        evicted = []
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None and previous[1] is not value:
+                evicted.append(previous[1])
+            self.entries[key] = (version, value)
+            while len(self.entries) > self.max_entries:
+                evicted.append(self.entries.popitem(last=False)[1][1])
+        for value in evicted:
+            self._evict(value)
+
+    def clear(self):
+        with self.lock:
+            values = [value for _, value in self.entries.values()]
+            self.entries.clear()
+        for value in values:
+            self._evict(value)
+
+    def _evict(self, value):
+        if self.on_evict:
+            self.on_evict(value)
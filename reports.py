@@ -0,0 +1,131 @@
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from arabic_text import shape, shape_all
+from membership import STATUS_ACTIVE, STATUS_EXPIRED, STATUS_EXPIRING
+
+# Report queries and drawing, kept free of Qt and pyplot so they can run on a
+# worker thread: each report draws on its own Figure and is rasterized with the
+# Agg backend. The window only turns the finished RGBA buffer into a pixmap.
+# matplotlib is imported on first render, on the worker thread, so importing
+# this module for the report titles is cheap. Every string drawn goes through
+# arabic_text.
+
+ACTIVE_MEMBERS = "تقرير الأعضاء النشطين"
+REVENUE = "تقرير الإيرادات"
+VISITS = "تقرير الزيارات"
+EQUIPMENT = "تقرير الأجهزة"
+EXPIRED_SUBSCRIPTIONS = "تقرير الاشتراكات المنتهية"
+
+RenderedReport = namedtuple('RenderedReport', ['report_type', 'width', 'height', 'rgba'])
+
+
+# Set from the GUI thread when the user moves on to another report; the worker
+# checks it between steps and gives up early.
+class CancelToken:
+    def __init__(self):
+        self.event = threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+
+def _pie(ax, values, labels, title):
+    ax.set_title(shape(title))
+    if not any(values):
+        ax.text(0.5, 0.5, shape("لا توجد بيانات"), ha='center', va='center', transform=ax.transAxes)
+        ax.axis('off')
+        return
+    ax.pie(values, labels=shape_all(labels), autopct='%1.1f%%')
+
+
+def active_members_data(db_manager):
+    active_count = db_manager.get_active_members_count()
+    return active_count, db_manager.get_total_members_count() - active_count
+
+
+def draw_active_members(ax, data):
+    _pie(ax, data, ['نشط', 'غير نشط'], 'نسبة الأعضاء النشطين')
+
+
+def draw_revenue(ax, data):
+    ax.bar(shape_all(row[0] for row in data), [row[2] for row in data])
+    ax.set_xlabel(shape('الخطط'))
+    ax.set_ylabel(shape('الإيرادات'))
+    ax.set_title(shape('الإيرادات حسب الخطة'))
+
+
+def draw_visits(ax, data):
+    ax.plot([row[0] for row in data], [row[1] for row in data])
+    ax.set_xlabel(shape('التاريخ'))
+    ax.set_ylabel(shape('عدد الزيارات'))
+    ax.set_title(shape('عدد الزيارات اليومية (آخر 30 يوم)'))
+    ax.figure.autofmt_xdate()
+
+
+def equipment_data(db_manager):
+    return db_manager.fetch_all("SELECT status, COUNT(*) FROM equipment GROUP BY status")
+
+
+def draw_equipment(ax, data):
+    _pie(ax, [row[1] for row in data], [row[0] for row in data], 'حالة الأجهزة')
+
+
+def expired_subscriptions_data(db_manager):
+    counts = db_manager.count_members_by_status()
+    return counts.get(STATUS_ACTIVE, 0) + counts.get(STATUS_EXPIRING, 0), counts.get(STATUS_EXPIRED, 0)
+
+
+def draw_expired_subscriptions(ax, data):
+    _pie(ax, data, ['نشط', 'منتهي'], 'نسبة الاشتراكات المنتهية')
+
+
+# Report title -> (query, draw); the order is the order shown in the window
+REPORTS = {
+    ACTIVE_MEMBERS: (active_members_data, draw_active_members),
+    REVENUE: (lambda db_manager: db_manager.get_revenue_by_plan(), draw_revenue),
+    VISITS: (lambda db_manager: db_manager.get_visits_last_30_days(), draw_visits),
+    EQUIPMENT: (equipment_data, draw_equipment),
+    EXPIRED_SUBSCRIPTIONS: (expired_subscriptions_data, draw_expired_subscriptions),
+}
+
+
+def cache_key(report_type, width, height):
+    # Reports that count against today are keyed on the date as well
+    return report_type, datetime.now().date().isoformat(), width, height
+
+
+def render_report(db_manager, report_type, width, height, dpi=100, token=None, progress=None):
+    # Returns None when cancelled part way through.
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    query, draw = REPORTS[report_type]
+    steps = 3
+    if progress:
+        progress(0, steps)
+    data = query(db_manager)
+    if token and token.cancelled:
+        return None
+    if progress:
+        progress(1, steps)
+
+    fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    draw(fig.add_subplot(), data)
+    if token and token.cancelled:
+        return None
+    if progress:
+        progress(2, steps)
+
+    canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+    rgba = bytes(canvas.buffer_rgba())
+    width, height = canvas.get_width_height()
+    if progress:
+        progress(steps, steps)
+    return RenderedReport(report_type, width, height, rgba)
@@ -0,0 +1,40 @@
+import sys
+import time
+
+# Startup timing for `--profile-startup`. Import this module first so the clock
+# starts before the heavy imports; mark() records a named checkpoint and
+# report() prints how long each phase took. Does nothing unless the flag is set.
+ENABLED = "--profile-startup" in sys.argv
+
+started = time.perf_counter()
+marks = []
+
+
+def mark(label):
+    if ENABLED:
+        marks.append((label, time.perf_counter()))
+        print(f"[startup] {label}: {(marks[-1][1] - started) * 1000:.1f} ms")
+
+
+def elapsed(first, last):
+    # first=None measures from process start (this module's import)
+    points = dict(marks)
+    points[None] = started
+    if first in points and last in points:
+        return (points[last] - points[first]) * 1000
+    return None
+
+
+def report(milestones=()):
+    # milestones: (title, first mark, last mark) spans summarized at the end
+    if not ENABLED:
+        return
+    print("[startup] phase breakdown:")
+    previous = started
+    for label, at in marks:
+        print(f"[startup]   {label:<32} {(at - previous) * 1000:8.1f} ms")
+        previous = at
+    for title, first, last in milestones:
+        duration = elapsed(first, last)
+        if duration is not None:
+            print(f"[startup] {title}: {duration:.1f} ms")
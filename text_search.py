@@ -0,0 +1,27 @@
+import re
+
+# Arabic spelling variants that users type interchangeably are folded to one
+# form, both when indexing member fields and when building search queries.
+_ARABIC_FOLDING = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ؤ': 'و', 'ئ': 'ي',
+    'ة': 'ه',
+    'ى': 'ي',
+})
+
+# Tashkeel (harakat, tanween, shadda, sukun, superscript alef) and tatweel
+_TASHKEEL = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+
+_TOKEN = re.compile(r'\w+')
+
+
+def normalize_arabic(text):
+    if text is None:
+        return None
+    return _TASHKEEL.sub('', str(text)).translate(_ARABIC_FOLDING).lower()
+
+
+def build_match_query(term):
+    # Every token becomes a quoted prefix query; FTS5 ANDs them together.
+    tokens = _TOKEN.findall(normalize_arabic(term) or '')
+    return ' '.join(f'"{token}"*' for token in tokens)
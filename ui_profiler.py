@@ -0,0 +1,181 @@
+import inspect
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from functools import wraps
+
+from PyQt5.QtCore import QTimer
+
+# UI responsiveness profiling for `--profile-ui`: a watchdog that notices when
+# the Qt event loop stops turning and captures the main thread's Python stack
+# while it is still stuck, and a profiler timing the GymManagementSystem
+# slots. A ranked report of the slowest actions is printed on exit.
+ENABLED = "--profile-ui" in sys.argv
+
+STALL_MS = 250
+HEARTBEAT_MS = 50
+STACK_DEPTH = 15
+
+
+# A QTimer on the GUI thread stamps a heartbeat every HEARTBEAT_MS; a helper
+# thread checks the stamp. When it is older than the threshold the main
+# thread is blocked, and its stack at that moment shows by what. The stall's
+# full length is known once the next heartbeat gets through.
+class StallWatchdog:
+    def __init__(self, threshold_ms=STALL_MS, interval_ms=HEARTBEAT_MS, profiler=None, max_stalls=50):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.profiler = profiler
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.stalls = deque(maxlen=max_stalls)
+        self.current = None
+        self.beats = 0
+        # Event-loop latency: how late the heartbeats ran, in total and at worst
+        self.busy_seconds = 0.0
+        self.max_lag = 0.0
+        self.last_beat = time.perf_counter()
+        self.main_thread = None
+        self.timer = None
+        self.thread = None
+
+    def start(self):
+        # Call on the GUI thread once the QApplication exists
+        self.main_thread = threading.get_ident()
+        self.last_beat = time.perf_counter()
+        self.timer = QTimer()
+        self.timer.setInterval(int(self.interval * 1000))
+        self.timer.timeout.connect(self.beat)
+        self.timer.start()
+        self.thread = threading.Thread(target=self.watch, name="ui-stall-watchdog", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.timer is not None:
+            self.timer.stop()
+
+    def beat(self):
+        now = time.perf_counter()
+        lag = max(0.0, now - self.last_beat - self.interval)
+        with self.lock:
+            self.last_beat = now
+            self.beats += 1
+            self.busy_seconds += lag
+            self.max_lag = max(self.max_lag, lag)
+            stall, self.current = self.current, None
+        if stall is not None:
+            stall['ms'] = lag * 1000
+            self.stalls.append(stall)
+            print(f"[ui] event loop blocked for {stall['ms']:.0f} ms in {stall['action']}")
+
+    def watch(self):
+        while not self.stopped.wait(self.interval / 2):
+            with self.lock:
+                if self.current is not None or time.perf_counter() - self.last_beat < self.interval + self.threshold:
+                    continue
+                frame = sys._current_frames().get(self.main_thread)
+                actions = list(self.profiler.active) if self.profiler else []
+                self.current = {
+                    'action': " > ".join(actions) or "(unknown)",
+                    'stack': traceback.format_stack(frame)[-STACK_DEPTH:] if frame else [],
+                }
+
+    def report(self):
+        lines = [f"[ui] {self.beats} heartbeats, event loop {self.busy_seconds * 1000:.0f} ms behind in total, "
+                 f"worst {self.max_lag * 1000:.0f} ms; {len(self.stalls)} stalls over {self.threshold * 1000:.0f} ms"]
+        for stall in sorted(self.stalls, key=lambda stall: stall['ms'], reverse=True):
+            lines.append(f"[ui] stall {stall['ms']:.0f} ms in {stall['action']}, main thread was at:")
+            lines.extend("    " + line.rstrip().replace("\n", "\n    ") for line in stall['stack'])
+        return lines
+
+
+class SlotProfiler:
+    def __init__(self, watchdog=None):
+        self.watchdog = watchdog
+        self.lock = threading.Lock()
+        self.timings = {}  # name -> [calls, blocked seconds, max blocked seconds, calls with a modal loop]
+        self.active = []   # slots running on the GUI thread, outermost first
+        self.main_thread = threading.get_ident()
+
+    def instrument(self, cls, skip=()):
+        # Wraps the public methods defined on cls. Do this before any instance
+        # connects its signals, so the connections pick up the wrappers.
+        for name, function in list(vars(cls).items()):
+            if inspect.isfunction(function) and not name.startswith('_') and name not in skip:
+                setattr(cls, name, self.wrap(f"{cls.__name__}.{name}", function))
+
+    def wrap(self, name, function):
+        # Signals pass extra arguments (e.g. clicked's `checked`) that the
+        # original slot would have been spared; drop them the same way.
+        parameters = inspect.signature(function).parameters.values()
+        max_args = None if any(parameter.kind == parameter.VAR_POSITIONAL for parameter in parameters) else sum(
+            parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD) for parameter in parameters)
+
+        @wraps(function)
+        def timed(*args, **kwargs):
+            if max_args is not None:
+                args = args[:max_args]
+            if threading.get_ident() != self.main_thread:
+                return function(*args, **kwargs)
+            watchdog = self.watchdog
+            beats, busy = (watchdog.beats, watchdog.busy_seconds) if watchdog else (0, 0.0)
+            self.active.append(name)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                ended = time.perf_counter()
+                self.active.pop()
+                blocked, modal = ended - started, False
+                if watchdog and watchdog.beats != beats:
+                    # A modal dialog ran its own event loop: count only the
+                    # time the loop was held up, not the time spent waiting
+                    # for the user.
+                    modal = True
+                    blocked = min(blocked, watchdog.busy_seconds - busy +
+                                  max(0.0, ended - watchdog.last_beat - watchdog.interval))
+                self.record(name, blocked, modal)
+
+        return timed
+
+    def record(self, name, seconds, modal=False):
+        with self.lock:
+            timing = self.timings.setdefault(name, [0, 0.0, 0.0, 0])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+            timing[3] += modal
+
+    def ranked(self):
+        # (name, calls, total ms, mean ms, max ms, modal calls), slowest single call first
+        with self.lock:
+            rows = [(name, calls, total * 1000, total * 1000 / calls, longest * 1000, modal)
+                    for name, (calls, total, longest, modal) in self.timings.items()]
+        return sorted(rows, key=lambda row: (row[4], row[2]), reverse=True)
+
+    def report(self, limit=25):
+        lines = ["[ui] slowest UI actions (time the event loop was blocked; times include nested slots):",
+                 f"[ui]   {'action':<48} {'calls':>6} {'total ms':>10} {'mean ms':>9} {'max ms':>9}"]
+        for name, calls, total, mean, longest, modal in self.ranked()[:limit]:
+            note = f"  ({modal} with a dialog)" if modal else ""
+            lines.append(f"[ui]   {name:<48} {calls:>6} {total:>10.1f} {mean:>9.1f} {longest:>9.1f}{note}")
+        return lines
+
+
+def install(app, window_class, threshold_ms=STALL_MS):
+    # Wires both up for `--profile-ui`; the report is printed when the app quits
+    watchdog = StallWatchdog(threshold_ms)
+    profiler = SlotProfiler(watchdog)
+    watchdog.profiler = profiler
+    profiler.instrument(window_class)
+    watchdog.start()
+
+    def report():
+        watchdog.stop()
+        print("\n".join(watchdog.report() + profiler.report()))
+
+    app.aboutToQuit.connect(report)
+    return watchdog, profiler
@@ -0,0 +1,32 @@
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class WorkerSignals(QObject):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+
+# Runs fn(*args, progress=callback, **kwargs) on a QThreadPool thread. The
+# callback takes (done, total) and is forwarded as a percentage signal.
+class Worker(QRunnable):
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+
+    def report_progress(self, done, total):
+        self.signals.progress.emit(int(done * 100 / total) if total else 0)
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, progress=self.report_progress, **self.kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.finished.emit(result)